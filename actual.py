@@ -2,11 +2,23 @@ import json
 import os
 import sublime
 import sublime_plugin
+import threading
+import time
 
 from .view import ActualVim
 from .edit import Edit
+from .keytrace import tracer
+from .profiler import INTERVAL, profiler
+from . import neo
+from . import replay
 from . import settings
 
+def recordings_dir():
+    return os.path.join(sublime.cache_path(), 'ActualVim', 'recordings')
+
+def profiles_dir():
+    return os.path.join(sublime.cache_path(), 'ActualVim', 'profiles')
+
 class ActualSkipCmd(sublime_plugin.TextCommand): pass
 
 class ActualEnable(sublime_plugin.ApplicationCommand):
@@ -47,6 +59,114 @@ class ActualDisableView(sublime_plugin.TextCommand):
             v.update_view()
 
 
+class ActualRestart(sublime_plugin.TextCommand):
+    def is_enabled(self):
+        return neo._loaded
+
+    def run(self, edit):
+        v = ActualVim.get(self.view, exact=False, create=False)
+        neo.restart(v.vim if v else neo.vim)
+
+
+class ActualDebounceStats(sublime_plugin.TextCommand):
+    def is_enabled(self):
+        return bool(ActualVim.get(self.view, exact=False, create=False))
+
+    def run(self, edit):
+        v = ActualVim.get(self.view, exact=False, create=False)
+        if v:
+            print('ActualVim: lines debounce stats for view {}:'.format(self.view.id()))
+            print(json.dumps(v.debounce.stats(), indent=4, sort_keys=True))
+            self.view.window().run_command('show_panel', {'panel': 'console'})
+
+
+class ActualRpcStats(sublime_plugin.TextCommand):
+    def is_enabled(self):
+        return neo._loaded
+
+    def run(self, edit):
+        stats = neo.rpc_metrics()
+        if not stats:
+            print('ActualVim: rpc metrics are disabled (see the rpc_metrics setting)')
+        for label, metrics in stats:
+            print('ActualVim: rpc stats for nvim {}:'.format(label))
+            print(json.dumps(metrics.snapshot(), indent=4, sort_keys=True))
+        self.view.window().run_command('show_panel', {'panel': 'console'})
+
+
+class ActualRecordRpc(sublime_plugin.TextCommand):
+    def vim(self):
+        v = ActualVim.get(self.view, exact=False, create=False)
+        return v.vim if v else neo.vim
+
+    def is_enabled(self, stop=False):
+        if not neo._loaded:
+            return False
+        recording = bool(getattr(self.vim(), 'recording', None))
+        return recording == stop
+
+    def run(self, edit, stop=False):
+        vim = self.vim()
+        if stop:
+            path = vim.stop_recording()
+            print('ActualVim: rpc recording saved to', path)
+        else:
+            name = time.strftime('rpc-%Y%m%d-%H%M%S.msgpack')
+            path = os.path.join(recordings_dir(), name)
+            vim.start_recording(path)
+            print('ActualVim: recording rpc traffic to', path)
+
+
+class ActualReplayRpc(sublime_plugin.ApplicationCommand):
+    def run(self):
+        path = replay.latest(recordings_dir())
+        if not path:
+            print('ActualVim: no rpc recordings in', recordings_dir())
+            return
+
+        def run():
+            stats = replay.Replay.from_file(path).run()
+            print('ActualVim: replayed {}:'.format(path))
+            print(json.dumps(stats, indent=4, sort_keys=True))
+        threading.Thread(target=run, daemon=True).start()
+        sublime.active_window().run_command('show_panel', {'panel': 'console'})
+
+
+class ActualProfile(sublime_plugin.ApplicationCommand):
+    def is_enabled(self, stop=False):
+        return profiler.running == stop
+
+    def run(self, stop=False):
+        if not stop:
+            profiler.start(settings.get('profile_interval', INTERVAL))
+            print('ActualVim: profiling, run "ActualVim: Stop Profiling" when done')
+            return
+
+        profiler.stop()
+        name = time.strftime('profile-%Y%m%d-%H%M%S')
+        paths = profiler.save(os.path.join(profiles_dir(), name))
+        print('ActualVim: {} samples over {:.1f}s saved to:'.format(profiler.samples, profiler.elapsed))
+        for path in paths:
+            print('  ' + path)
+        print('ActualVim: try `python -m pstats {}` or flamegraph.pl {}'.format(*paths))
+        sublime.active_window().run_command('show_panel', {'panel': 'console'})
+
+
+class ActualKeyLatency(sublime_plugin.TextCommand):
+    def run(self, edit):
+        if not tracer.enabled:
+            print('ActualVim: key tracing is disabled (see the key_trace setting)')
+            self.view.window().run_command('show_panel', {'panel': 'console'})
+            return
+        print('ActualVim: keystroke latency by mode:')
+        print(json.dumps(tracer.summary(), indent=4, sort_keys=True))
+        print('ActualVim: slowest keys:')
+        for t in tracer.slowest(10):
+            phases = ', '.join('{} {:.2f}ms'.format(name, ms) for name, ms in t['phases'])
+            print('  {!r} ({}, {} chars): {:.2f}ms ({})'.format(t['key'], t['mode'], t['size'], t['total_ms'], phases))
+        self.view.window().run_command('show_panel', {'panel': 'console'})
+
+
 class ActualKeypress(sublime_plugin.TextCommand):
     def is_enabled(self):
         v = ActualVim.get(self.view, exact=False, create=False)
@@ -60,7 +180,11 @@ class ActualKeypress(sublime_plugin.TextCommand):
             if key is not None:
                 if key == '<':
                     key = '<lt>'
+                mode = v.vim.status_last.get('mode') if neo._loaded else None
+                tracer.begin(self.view.id(), key, mode, self.view.size())
                 v.press(key, edit=edit)
+                # done here if vim was ready and the update ran in this edit
+                tracer.finish(self.view.id())
 
 
 class ActualViewListener(sublime_plugin.ViewEventListener):
@@ -107,7 +231,8 @@ class ActualGlobalListener(sublime_plugin.EventListener):
 
     def on_post_save_async(self, view):
         v = ActualVim.get(view, create=False)
-        if v:
+        # with lazy start, nvim may not have our buffer yet
+        if v and v.buf is not None:
             v.set_path(view.file_name())
             v.buf.options['modified'] = view.is_dirty()
 
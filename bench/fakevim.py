@@ -0,0 +1,856 @@
+#!/usr/bin/env python3
+# fakevim.py
+# a stand-in for the subset of the nvim api ActualVim uses, with injected latency, for load tests without nvim
+#
+# it speaks msgpack-rpc like nvim does, so it plugs in anywhere nvim would:
+#     as a child:    neovim.attach('child', argv=fakevim.argv(latency=0.002))
+#     as a server:   python3 bench/fakevim.py --listen /tmp/fake.sock, then neovim.attach('socket', path=...)
+#     in process:    server = fakevim.serve('/tmp/fake.sock', latency=0.002) ... server.close()
+#     in Sublime:    point the neovim_path setting at this file (it ignores the nvim args it doesn't know)
+# like bench/transport.py it needs a python that can import the vendored msgpack (<= 3.6)
+#
+# the editing model is deliberately tiny: insert mode, a few motions, x/dd, visual mode and ':'.
+# keys it doesn't know are swallowed, so typing through it always ends up in a known state.
+
+import argparse
+import contextlib
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# the vendored msgpack warns on stdout when it falls back, which would corrupt an --embed channel
+with contextlib.redirect_stdout(sys.stderr):
+    from ActualVim.lib.msgpack import umsgpack
+
+REQUEST = 0
+RESPONSE = 1
+NOTIFICATION = 2
+
+BUFFER, WINDOW, TABPAGE = 0, 1, 2
+
+API_INFO = {
+    'version': {'major': 0, 'minor': 2, 'patch': 2, 'api_level': 3, 'api_compatible': 0, 'api_prerelease': False},
+    'types': {
+        'Buffer': {'id': BUFFER, 'prefix': 'nvim_buf_'},
+        'Window': {'id': WINDOW, 'prefix': 'nvim_win_'},
+        'Tabpage': {'id': TABPAGE, 'prefix': 'nvim_tabpage_'},
+    },
+    'functions': [],
+    'ui_events': [],
+}
+
+# mode() value -> (mode_change name, mode index)
+MODES = {
+    'n': ('normal', 0),
+    'i': ('insert', 1),
+    'v': ('visual', 2),
+    'V': ('visual', 2),
+    '\x16': ('visual', 2),
+    'c': ('cmdline_normal', 3),
+    'no': ('operator', 4),
+}
+
+# one key per match: <c-\><c-n> as a unit, then any <notation>, then single characters
+KEY_RE = re.compile(r'<[cC]-\\><[cC]-[nN]>|<[^<>]+>|.', re.S)
+KEY_NAMES = {
+    '<c-\\><c-n>': '<c-n-escape>',
+    '<lt>': '<',
+    '<space>': ' ',
+    '<tab>': '\t',
+    '<enter>': '<cr>',
+    '<return>': '<cr>',
+    '<c-m>': '<cr>',
+    '<c-[>': '<esc>',
+    '<c-c>': '<esc>',
+    '<backspace>': '<bs>',
+    '<c-h>': '<bs>',
+}
+
+ALIASES = {
+    'vim_get_api_info': 'nvim_get_api_info',
+    'buffer_line_count': 'nvim_buf_line_count',
+}
+
+
+class FakeError(Exception):
+    pass
+
+
+def _str(s):
+    if isinstance(s, bytes):
+        return s.decode('utf8', 'replace')
+    return s
+
+
+def split_keys(keys):
+    for m in KEY_RE.finditer(keys):
+        key = m.group()
+        if len(key) > 1:
+            key = key.lower()
+            key = KEY_NAMES.get(key, key)
+        yield key
+
+
+def split_list(expr):
+    # splits the items of a vimscript list literal (without the brackets) at top level commas
+    items, depth, quote, escape, start = [], 0, None, False, 0
+    for i, c in enumerate(expr):
+        if escape:
+            escape = False
+        elif quote:
+            if c == quote:
+                quote = None
+            elif c == '\\' and quote == '"':
+                escape = True
+        elif c in '"\'':
+            quote = c
+        elif c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            items.append(expr[start:i])
+            start = i + 1
+    tail = expr[start:]
+    if tail.strip():
+        items.append(tail)
+    return [item.strip() for item in items]
+
+
+class FakeBuffer:
+    def __init__(self, number):
+        self.number = number
+        self.lines = ['']
+        self.changedtick = 2
+        self.modified = False
+        self.options = {'buftype': '', 'undolevels': 1000}
+        self.vars = {}
+        # the channel that gets nvim_buf_lines_event, see nvim_buf_attach
+        self.attached = None
+
+    @property
+    def ext(self):
+        return umsgpack.Ext(BUFFER, umsgpack.packb(self.number))
+
+    def index(self, i):
+        # nvim line indexes: negative counts from past the end, so -1 is len(lines)
+        if i < 0:
+            i += len(self.lines) + 1
+        return i
+
+
+class Channel:
+    def __init__(self, fake, rfile, write, close=None):
+        self.fake = fake
+        self.rfile = rfile
+        self.write = write
+        self._close = close
+        self.write_lock = threading.Lock()
+        self.id = fake.new_channel_id()
+        self.closed = False
+
+    def send(self, msg):
+        data = umsgpack.packb(msg)
+        with self.write_lock:
+            if self.closed:
+                return
+            try:
+                self.write(data)
+            except OSError:
+                self.closed = True
+
+    def serve(self):
+        try:
+            while not (self.closed or self.fake.exited):
+                try:
+                    msg = umsgpack.unpack(self.rfile)
+                except (umsgpack.UnpackException, OSError, ValueError):
+                    break
+                self.fake.handle(self, msg)
+        finally:
+            self.close()
+            self.fake.disconnect(self)
+
+    def close(self):
+        self.closed = True
+        if self._close:
+            self._close()
+
+
+class FakeNvim:
+    def __init__(self, latency=0, method_latency=None, redraw_rows=1, event_lines=1, popupmenu_items=10):
+        # latency: seconds slept before answering each request, method_latency overrides it per method
+        # redraw_rows: screen rows repainted after each input, 0 repaints the whole screen
+        # event_lines: lines sent in each nvim_buf_lines_event for an edit, from the edited line down
+        # popupmenu_items: completion items shown by <c-n>/<c-p> in insert mode
+        self.latency = latency
+        self.method_latency = method_latency or {}
+        self.redraw_rows = redraw_rows
+        self.event_lines = max(1, event_lines)
+        self.popupmenu_items = popupmenu_items
+
+        # nvim is single threaded, so every request holds this
+        self.lock = threading.RLock()
+        self.channel_ids = 0
+        self.exited = False
+        self.on_quit = None
+
+        self.buffers = {}
+        self.next_buffer = 1
+        self.current = self.buf_new()
+        self.options = {'hidden': False, 'expandtab': 0, 'ts': 8, 'wrap': 1}
+        self.vars = {}
+
+        self.mode = 'n'
+        self.last_mode = None
+        self.cursor = [0, 0]
+        self.vstart = [0, 0]
+        self.cmdline = None
+        self.popupmenu = None
+
+        self.ui = None
+        self.width, self.height = 80, 24
+        self.pending = []
+
+        self.stats = {'requests': 0, 'notifications': 0, 'inputs': 0, 'lines_events': 0, 'redraws': 0}
+
+    def new_channel_id(self):
+        with self.lock:
+            self.channel_ids += 1
+            return self.channel_ids
+
+    # rpc plumbing
+    def handle(self, channel, msg):
+        kind = msg[0]
+        if kind == REQUEST:
+            _, msgid, method, args = msg
+            method = _str(method)
+            delay = self.method_latency.get(method, self.latency)
+            if delay:
+                time.sleep(delay)
+            with self.lock:
+                self.stats['requests'] += 1
+                try:
+                    result, err = self.call(channel, method, args), None
+                except FakeError as e:
+                    result, err = None, [0, str(e)]
+                except Exception as e:
+                    # a bug in the fake, answer like nvim would rather than dying
+                    traceback.print_exc()
+                    result, err = None, [0, 'fakevim: {}: {}'.format(method, e)]
+                channel.send([RESPONSE, msgid, err, result])
+                self.flush()
+        elif kind == NOTIFICATION:
+            _, method, args = msg
+            with self.lock:
+                self.stats['notifications'] += 1
+                try:
+                    self.call(channel, _str(method), args)
+                except FakeError:
+                    pass
+                self.flush()
+
+    def call(self, channel, method, args):
+        method = ALIASES.get(method, method)
+        fn = getattr(self, method, None)
+        if not method.startswith('nvim_') or fn is None:
+            raise FakeError('Invalid method name: {}'.format(method))
+        try:
+            return fn(channel, *args)
+        except TypeError as e:
+            raise FakeError('Wrong number of arguments for {}: {}'.format(method, e))
+
+    def notify(self, channel, method, args):
+        # sent after the response to the request that caused them, like nvim's queued events
+        if channel and not channel.closed:
+            self.pending.append((channel, method, args))
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        for channel, method, args in pending:
+            channel.send([NOTIFICATION, method, args])
+
+    def disconnect(self, channel):
+        with self.lock:
+            if self.ui is channel:
+                self.ui = None
+            for buf in self.buffers.values():
+                if buf.attached is channel:
+                    buf.attached = None
+
+    def quit(self):
+        self.exited = True
+        if self.on_quit:
+            self.on_quit()
+
+    # state helpers
+    def buf_new(self):
+        buf = FakeBuffer(self.next_buffer)
+        self.buffers[buf.number] = buf
+        self.next_buffer += 1
+        return buf
+
+    def buffer(self, obj):
+        if isinstance(obj, umsgpack.Ext):
+            obj = umsgpack.unpackb(obj.data)
+        buf = self.current if obj == 0 else self.buffers.get(obj)
+        if buf is None:
+            raise FakeError('Invalid buffer id: {}'.format(obj))
+        return buf
+
+    def set_mode(self, mode):
+        self.mode = mode
+        if mode in ('v', 'V', '\x16'):
+            self.vstart = list(self.cursor)
+
+    def clamp(self):
+        lines = self.current.lines
+        line = min(max(self.cursor[0], 0), len(lines) - 1)
+        limit = len(lines[line]) if self.mode == 'i' else max(len(lines[line]) - 1, 0)
+        self.cursor = [line, min(max(self.cursor[1], 0), limit)]
+
+    def replace(self, buf, start, end, lines):
+        old_end = end
+        buf.lines[start:end] = lines
+        if not buf.lines:
+            buf.lines = ['']
+        buf.changedtick += 1
+        buf.modified = True
+        if buf.attached:
+            end = start + len(lines)
+            # pad the event out to event_lines with unchanged lines, to model larger payloads
+            extra = min(self.event_lines - len(lines), len(buf.lines) - end)
+            if extra > 0:
+                lines = lines + buf.lines[end:end + extra]
+                old_end += extra
+            self.stats['lines_events'] += 1
+            self.notify(buf.attached, 'nvim_buf_lines_event', [buf.ext, buf.changedtick, start, old_end, lines, False])
+
+    # editing model
+    def press(self, key):
+        buf = self.current
+        line, col = self.cursor
+        text = buf.lines[line]
+
+        if self.popupmenu is not None and key not in ('<c-n>', '<c-p>'):
+            self.popupmenu = None
+            self.redraw_event('popupmenu_hide', [])
+
+        if key == '<c-n-escape>':
+            if self.mode == 'c':
+                self.cmdline = None
+                self.redraw_event('cmdline_hide', [0])
+            self.set_mode('n')
+        elif self.mode == 'i':
+            if key == '<esc>':
+                self.set_mode('n')
+                self.cursor[1] -= 1
+            elif key == '<cr>':
+                self.replace(buf, line, line + 1, [text[:col], text[col:]])
+                self.cursor = [line + 1, 0]
+            elif key == '<bs>':
+                if col > 0:
+                    self.replace(buf, line, line + 1, [text[:col - 1] + text[col:]])
+                    self.cursor[1] -= 1
+                elif line > 0:
+                    prev = buf.lines[line - 1]
+                    self.replace(buf, line - 1, line + 1, [prev + text])
+                    self.cursor = [line - 1, len(prev)]
+            elif key in ('<c-n>', '<c-p>'):
+                self.complete(key)
+            elif key in ('<left>', '<right>', '<up>', '<down>'):
+                self.move(key)
+            elif len(key) == 1:
+                self.replace(buf, line, line + 1, [text[:col] + key + text[col:]])
+                self.cursor[1] += 1
+        elif self.mode == 'c':
+            if key in ('<esc>', '<cr>') or key == '<bs>' and not self.cmdline:
+                self.cmdline = None
+                self.redraw_event('cmdline_hide', [0])
+                self.set_mode('n')
+            elif key == '<bs>':
+                self.cmdline = self.cmdline[:-1]
+                self.redraw_event('cmdline_show', [[[{}, self.cmdline]], len(self.cmdline), ':', '', 0, 0])
+            elif len(key) == 1:
+                self.cmdline += key
+                self.redraw_event('cmdline_show', [[[{}, self.cmdline]], len(self.cmdline), ':', '', 0, 0])
+        elif self.mode == 'no':
+            if key == 'd':
+                if len(buf.lines) > 1:
+                    self.replace(buf, line, line + 1, [])
+                else:
+                    self.replace(buf, 0, 1, [''])
+                self.cursor = [min(line, len(buf.lines) - 1), 0]
+            self.set_mode('n')
+        elif self.mode in ('v', 'V', '\x16'):
+            if key == '<esc>' or key == 'y':
+                self.set_mode('n')
+            elif key in ('d', 'x'):
+                self.delete_visual()
+                self.set_mode('n')
+            else:
+                self.move(key)
+        else:
+            if key in ('i', 'a', 'A', 'I', 'o', 'O'):
+                self.set_mode('i')
+                if key == 'a' and text:
+                    self.cursor[1] += 1
+                elif key == 'A':
+                    self.cursor[1] = len(text)
+                elif key == 'I':
+                    self.cursor[1] = 0
+                elif key == 'o':
+                    self.replace(buf, line + 1, line + 1, [''])
+                    self.cursor = [line + 1, 0]
+                elif key == 'O':
+                    self.replace(buf, line, line, [''])
+                    self.cursor = [line, 0]
+            elif key in ('v', 'V', '<c-v>'):
+                self.set_mode('\x16' if key == '<c-v>' else key)
+            elif key == 'x':
+                if text:
+                    self.replace(buf, line, line + 1, [text[:col] + text[col + 1:]])
+            elif key == 'd':
+                self.set_mode('no')
+            elif key == ':':
+                self.set_mode('c')
+                self.cmdline = ''
+                self.redraw_event('cmdline_show', [[[{}, '']], 0, ':', '', 0, 0])
+            else:
+                self.move(key)
+        self.clamp()
+
+    def move(self, key):
+        line, col = self.cursor
+        if key in ('h', '<left>'):
+            col -= 1
+        elif key in ('l', '<right>', ' '):
+            col += 1
+        elif key in ('j', '<down>'):
+            line += 1
+        elif key in ('k', '<up>'):
+            line -= 1
+        elif key == '0':
+            col = 0
+        elif key == '$':
+            col = len(self.current.lines[line])
+        elif key == 'G':
+            line = len(self.current.lines) - 1
+        self.cursor = [line, col]
+
+    def delete_visual(self):
+        buf = self.current
+        a, b = sorted([tuple(self.vstart), tuple(self.cursor)])
+        if self.mode == 'V':
+            if b[0] - a[0] + 1 >= len(buf.lines):
+                self.replace(buf, 0, len(buf.lines), [''])
+            else:
+                self.replace(buf, a[0], b[0] + 1, [])
+            self.cursor = [a[0], 0]
+        else:
+            joined = buf.lines[a[0]][:a[1]] + buf.lines[b[0]][b[1] + 1:]
+            self.replace(buf, a[0], b[0] + 1, [joined])
+            self.cursor = list(a)
+
+    def complete(self, key):
+        if self.popupmenu is None:
+            items = [['item{}'.format(i), '', '', ''] for i in range(self.popupmenu_items)]
+            self.popupmenu = 0 if key == '<c-n>' else len(items) - 1
+            self.redraw_event('popupmenu_show', [items, self.popupmenu, self.cursor[0], self.cursor[1]])
+        elif self.popupmenu_items:
+            step = 1 if key == '<c-n>' else -1
+            self.popupmenu = (self.popupmenu + step) % self.popupmenu_items
+            self.redraw_event('popupmenu_select', [self.popupmenu])
+
+    # screen
+    def redraw_event(self, name, *args):
+        if self.ui:
+            self.notify(self.ui, 'redraw', [[name] + list(args)])
+
+    def redraw(self, full=False):
+        if not self.ui:
+            return
+        self.stats['redraws'] += 1
+        buf = self.current
+        rows = self.height - 2
+        batch = []
+        if full:
+            batch.append(['resize', [self.width, self.height]])
+            batch.append(['clear', []])
+        if self.mode != self.last_mode:
+            batch.append(['mode_change', list(MODES.get(self.mode, MODES['n']))])
+            self.last_mode = self.mode
+
+        count = rows if full or self.redraw_rows <= 0 else min(self.redraw_rows, rows)
+        first = min(self.cursor[0], rows - 1) if count < rows else 0
+        for i in range(count):
+            y = (first + i) % rows
+            text = buf.lines[y] if y < len(buf.lines) else '~'
+            batch.append(['cursor_goto', [y, 0]])
+            if text:
+                batch.append(['put'] + [[c] for c in text[:self.width]])
+            batch.append(['eol_clear', []])
+
+        status = '-- INSERT --' if self.mode == 'i' else '-- VISUAL --' if self.mode in ('v', 'V', '\x16') else ''
+        batch.append(['cursor_goto', [self.height - 1, 0]])
+        batch.append(['highlight_set', [{'bold': True}]])
+        if status:
+            batch.append(['put'] + [[c] for c in status])
+        batch.append(['highlight_set', [{}]])
+        batch.append(['eol_clear', []])
+        batch.append(['cursor_goto', [min(self.cursor[0], rows - 1), min(self.cursor[1], self.width - 1)]])
+        batch.append(['flush', []])
+        self.notify(self.ui, 'redraw', batch)
+
+    # vimscript, just the expressions and commands ActualVim sends
+    def eval(self, expr):
+        expr = expr.strip()
+        if expr.startswith('[') and expr.endswith(']'):
+            return [self.eval(item) for item in split_list(expr[1:-1])]
+        if re.match(r'-?\d+$', expr):
+            return int(expr)
+        if re.match(r'-?\d+\.\d+$', expr):
+            return float(expr)
+        buf = self.current
+        line, col = self.cursor
+        if expr == 'mode()':
+            return self.mode[0] if self.mode == 'no' else self.mode
+        elif expr.startswith('&'):
+            name = expr[1:]
+            if name == 'modified':
+                return int(buf.modified)
+            return self.options.get(name, buf.options.get(name, 0))
+        elif expr.startswith('execute('):
+            return ''
+        elif expr == 'winsaveview()':
+            return {'lnum': line + 1, 'col': col, 'coladd': 0, 'curswant': col,
+                    'topline': 1, 'topfill': 0, 'leftcol': 0, 'skipcol': 0}
+        elif expr.startswith('winrestview('):
+            return 0
+        elif expr == 'winwidth(winnr())':
+            return self.width
+        elif expr == 'winheight(winnr())':
+            return self.height - 2
+        elif expr == 'screenrow()':
+            return min(line, self.height - 3) + 1
+        elif expr == 'screencol()':
+            return col + 1
+        elif expr == 'getpid()':
+            return os.getpid()
+
+        m = re.match(r'(line|col)\("([.v])"\)(?:\s*-\s*1)?$', expr)
+        if m:
+            pos = self.vstart if m.group(2) == 'v' and self.mode in ('v', 'V', '\x16') else self.cursor
+            value = pos[0] + 1 if m.group(1) == 'line' else pos[1] + 1
+            return value - 1 if expr.endswith('1') else value
+        m = re.match(r'getbufvar\((.+),\s*"changedtick"\)$', expr)
+        if m:
+            arg = m.group(1).strip()
+            return (buf if arg == 'bufnr("%")' else self.buffer(int(arg))).changedtick
+        m = re.match(r'cursor\((\d+),\s*(\d+)\)$', expr)
+        if m:
+            self.cursor = [int(m.group(1)) - 1, int(m.group(2)) - 1]
+            self.clamp()
+            return 0
+        m = re.match(r'setpos\("([.\'<>a-z]+)",\s*\[0,\s*(\d+),\s*(\d+)\]\)$', expr)
+        if m:
+            pos = [int(m.group(2)) - 1, int(m.group(3)) - 1]
+            if m.group(1) == '.':
+                self.cursor = pos
+                self.clamp()
+            return 0
+        raise FakeError('fakevim: unsupported expression: {}'.format(expr))
+
+    def command(self, cmd):
+        cmd = cmd.strip()
+        m = re.match(r'(b|buffer|bw|bwipeout)!?\s+(\d+)$', cmd)
+        if m:
+            buf = self.buffer(int(m.group(2)))
+            if m.group(1).startswith('bw'):
+                del self.buffers[buf.number]
+                if buf is self.current:
+                    self.current = next(iter(self.buffers.values()), None) or self.buf_new()
+            else:
+                self.current = buf
+            self.cursor = [0, 0]
+            return ''
+        if cmd == 'enew':
+            self.current = self.buf_new()
+            self.cursor = [0, 0]
+        elif cmd in ('qa!', 'qa', 'qall!', 'q!', 'q'):
+            self.quit()
+        elif cmd.startswith('normal! ') or cmd.startswith('exe "normal! '):
+            mode = cmd[-1] if cmd.startswith('normal!') else '\x16'
+            if mode in ('v', 'V', '\x16'):
+                self.set_mode(mode)
+        elif cmd.startswith('set '):
+            for opt in cmd.split()[1:]:
+                name, _, value = opt.partition('=')
+                if value:
+                    self.options[name] = int(value) if value.isdigit() else value
+                elif name.startswith('no'):
+                    self.options[name[2:]] = 0
+                else:
+                    self.options[name] = 1
+        # everything else (autocmds, functions, filetype detection) is accepted and ignored
+        return ''
+
+    # api
+    def nvim_get_api_info(self, channel):
+        return [channel.id, API_INFO]
+
+    def nvim_input(self, channel, keys):
+        keys = _str(keys)
+        self.stats['inputs'] += 1
+        for key in split_keys(keys):
+            self.press(key)
+        self.redraw()
+        return len(keys.encode('utf8'))
+
+    def nvim_get_mode(self, channel):
+        return {'mode': self.mode, 'blocking': self.mode == 'no'}
+
+    def nvim_eval(self, channel, expr):
+        return self.eval(_str(expr))
+
+    def nvim_command(self, channel, cmd):
+        for part in _str(cmd).split('|'):
+            self.command(part)
+        self.redraw()
+
+    def nvim_command_output(self, channel, cmd):
+        self.nvim_command(channel, cmd)
+        return ''
+
+    def nvim_call_atomic(self, channel, calls):
+        results = []
+        for i, (method, args) in enumerate(calls):
+            try:
+                results.append(self.call(channel, _str(method), args))
+            except FakeError as e:
+                return [results, [i, 0, str(e)]]
+        return [results, None]
+
+    def nvim_set_option(self, channel, name, value):
+        self.options[_str(name)] = value
+
+    def nvim_get_option(self, channel, name):
+        return self.options.get(_str(name), 0)
+
+    def nvim_set_var(self, channel, name, value):
+        self.vars[_str(name)] = value
+
+    def nvim_get_var(self, channel, name):
+        try:
+            return self.vars[_str(name)]
+        except KeyError:
+            raise FakeError('Key not found: {}'.format(_str(name)))
+
+    def nvim_subscribe(self, channel, event):
+        pass
+
+    def nvim_list_bufs(self, channel):
+        return [buf.ext for buf in self.buffers.values()]
+
+    def nvim_get_current_buf(self, channel):
+        return self.current.ext
+
+    def nvim_buf_line_count(self, channel, buf):
+        return len(self.buffer(buf).lines)
+
+    def nvim_buf_get_lines(self, channel, buf, start, end, strict):
+        buf = self.buffer(buf)
+        start, end = buf.index(start), buf.index(end)
+        if strict and not (0 <= start <= end <= len(buf.lines)):
+            raise FakeError('Index out of bounds')
+        return buf.lines[start:end]
+
+    def nvim_buf_set_lines(self, channel, buf, start, end, strict, lines):
+        buf = self.buffer(buf)
+        start, end = buf.index(start), buf.index(end)
+        if strict and not (0 <= start <= end <= len(buf.lines)):
+            raise FakeError('Index out of bounds')
+        start = min(max(start, 0), len(buf.lines))
+        end = min(max(end, start), len(buf.lines))
+        self.replace(buf, start, end, [_str(line) for line in lines])
+        if buf is self.current:
+            self.clamp()
+
+    def nvim_buf_get_option(self, channel, buf, name):
+        return self.buffer(buf).options.get(_str(name), 0)
+
+    def nvim_buf_set_option(self, channel, buf, name, value):
+        self.buffer(buf).options[_str(name)] = value
+
+    def nvim_buf_get_var(self, channel, buf, name):
+        try:
+            return self.buffer(buf).vars[_str(name)]
+        except KeyError:
+            raise FakeError('Key not found: {}'.format(_str(name)))
+
+    def nvim_buf_set_var(self, channel, buf, name, value):
+        self.buffer(buf).vars[_str(name)] = value
+
+    def nvim_buf_get_changedtick(self, channel, buf):
+        return self.buffer(buf).changedtick
+
+    def nvim_buf_attach(self, channel, buf, send_buffer, opts):
+        buf = self.buffer(buf)
+        buf.attached = channel
+        if send_buffer:
+            self.stats['lines_events'] += 1
+            self.notify(channel, 'nvim_buf_lines_event', [buf.ext, buf.changedtick, 0, -1, list(buf.lines), False])
+        return True
+
+    def nvim_buf_detach(self, channel, buf):
+        buf = self.buffer(buf)
+        if buf.attached is channel:
+            buf.attached = None
+        return True
+
+    def nvim_ui_attach(self, channel, width, height, options):
+        self.ui = channel
+        self.width, self.height = width, height
+        self.last_mode = None
+        self.redraw(full=True)
+
+    def nvim_ui_try_resize(self, channel, width, height):
+        self.width, self.height = width, height
+        self.redraw(full=True)
+
+    def nvim_ui_detach(self, channel):
+        if self.ui is channel:
+            self.ui = None
+
+
+class FakeServer:
+    # serves a FakeNvim on a unix socket from background threads, each connection is a channel
+    def __init__(self, path, **options):
+        self.path = path
+        self.fake = FakeNvim(**options)
+        self.fake.on_quit = self.close
+        self.sock = None
+        self.channels = []
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen(4)
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def _accept(self):
+        while self.sock:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            rfile = conn.makefile('rb')
+
+            def close(conn=conn):
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                conn.close()
+
+            channel = Channel(self.fake, rfile, conn.sendall, close)
+            self.channels.append(channel)
+            thread = threading.Thread(target=channel.serve)
+            thread.daemon = True
+            thread.start()
+
+    def close(self):
+        sock, self.sock = self.sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        for channel in self.channels:
+            channel.close()
+        self.channels = []
+
+    def wait(self):
+        while self.sock:
+            time.sleep(0.1)
+
+
+def serve(path, **options):
+    # start a FakeServer in this process, options are FakeNvim's
+    return FakeServer(path, **options).start()
+
+
+def argv(python=None, **options):
+    # a command line that runs the fake as an embedded child, for neovim.attach('child', argv=...)
+    args = [python or sys.executable, os.path.abspath(__file__), '--embed']
+    if options.get('latency'):
+        args += ['--latency', str(options['latency'] * 1000)]
+    for method, seconds in (options.get('method_latency') or {}).items():
+        args += ['--method-latency', '{}={}'.format(method, seconds * 1000)]
+    for name in ('redraw_rows', 'event_lines', 'popupmenu_items'):
+        if name in options:
+            args += ['--' + name.replace('_', '-'), str(options[name])]
+    return args
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='fake nvim for load tests', allow_abbrev=False)
+    parser.add_argument('--embed', action='store_true', help='speak rpc on stdin/stdout (the default)')
+    parser.add_argument('--headless', action='store_true', help='ignored, for nvim compatibility')
+    parser.add_argument('--listen', metavar='PATH', help='serve on a unix socket instead of stdio')
+    parser.add_argument('--latency', type=float, default=0, metavar='MS', help='delay before every response')
+    parser.add_argument('--method-latency', action='append', default=[], metavar='METHOD=MS',
+                        help='delay for one method, overrides --latency')
+    parser.add_argument('--redraw-rows', type=int, default=1, metavar='N',
+                        help='screen rows repainted after each input, 0 for the whole screen')
+    parser.add_argument('--event-lines', type=int, default=1, metavar='N',
+                        help='lines sent in each lines event for an edit')
+    parser.add_argument('--popupmenu-items', type=int, default=10, metavar='N',
+                        help='completion items shown by <c-n>')
+    # the rest are nvim arguments passed along by ActualVim, like -n and --cmd
+    opts, _ = parser.parse_known_args(args)
+
+    method_latency = {}
+    for item in opts.method_latency:
+        method, _, ms = item.partition('=')
+        method_latency[method] = float(ms) / 1000
+    options = {
+        'latency': opts.latency / 1000,
+        'method_latency': method_latency,
+        'redraw_rows': opts.redraw_rows,
+        'event_lines': opts.event_lines,
+        'popupmenu_items': opts.popupmenu_items,
+    }
+
+    if opts.listen:
+        serve(opts.listen, **options).wait()
+        return
+
+    rfile, wfile = sys.stdin.buffer, sys.stdout.buffer
+    # keep stray prints off the rpc channel
+    sys.stdout = sys.stderr
+
+    def write(data):
+        wfile.write(data)
+        wfile.flush()
+
+    Channel(FakeNvim(**options), rfile, write).serve()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,541 @@
+# sublime_stub.py
+# just enough of the sublime and sublime_plugin modules to run the plugin outside Sublime, for bench/suite.py
+#
+# install() registers them in sys.modules, so it has to run before anything imports the plugin.
+# set_timeout() only queues, call run_timeouts() to run what's due (there is no main thread loop).
+# views keep their text as a list of lines with lazily computed line offsets, so edits near a point
+# don't cost a pass over a million line file, as they wouldn't in Sublime.
+
+import bisect
+import copy
+import os
+import re
+import sys
+import tempfile
+import threading
+import types
+
+VERSION = '3211'
+
+DRAW_NO_FILL = 32
+DRAW_NO_OUTLINE = 256
+INHIBIT_WORD_COMPLETIONS = 8
+INHIBIT_EXPLICIT_COMPLETIONS = 16
+
+_timeouts = []
+_timeouts_lock = threading.Lock()
+_settings = {}
+_windows = []
+_ids = iter(range(1, 1 << 30))
+
+
+class Region:
+    __slots__ = ('a', 'b', 'xpos')
+
+    def __init__(self, a, b=None, xpos=-1):
+        self.a = a
+        self.b = a if b is None else b
+        self.xpos = xpos
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return abs(self.b - self.a)
+
+    def empty(self):
+        return self.a == self.b
+
+    def cover(self, other):
+        return Region(min(self.begin(), other.begin()), max(self.end(), other.end()))
+
+    def contains(self, x):
+        if isinstance(x, Region):
+            return self.begin() <= x.begin() and x.end() <= self.end()
+        return self.begin() <= x <= self.end()
+
+    def __len__(self):
+        return self.size()
+
+    def __eq__(self, other):
+        return isinstance(other, Region) and (self.a, self.b) == (other.a, other.b)
+
+    def __hash__(self):
+        return hash((self.a, self.b))
+
+    def __repr__(self):
+        return '({}, {})'.format(self.a, self.b)
+
+
+class Selection:
+    def __init__(self):
+        self.regions = []
+
+    def clear(self):
+        self.regions = []
+
+    def add(self, region):
+        if isinstance(region, int):
+            region = Region(region)
+        self.regions.append(region)
+        self.regions.sort(key=Region.begin)
+
+    def add_all(self, regions):
+        for region in regions:
+            self.add(region)
+
+    def __getitem__(self, i):
+        return self.regions[i]
+
+    def __iter__(self):
+        return iter(list(self.regions))
+
+    def __len__(self):
+        return len(self.regions)
+
+
+class Settings:
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.callbacks = {}
+
+    def get(self, key, default=None):
+        # like Sublime, values are copies, so callers can mutate what they get
+        return copy.deepcopy(self.values.get(key, default))
+
+    def set(self, key, value):
+        self.values[key] = copy.deepcopy(value)
+        for cb in list(self.callbacks.values()):
+            set_timeout(cb)
+
+    def has(self, key):
+        return key in self.values
+
+    def erase(self, key):
+        self.values.pop(key, None)
+
+    def add_on_change(self, tag, cb):
+        self.callbacks[tag] = cb
+
+    def clear_on_change(self, tag):
+        self.callbacks.pop(tag, None)
+
+
+class View:
+    def __init__(self, window=None, text='', name=''):
+        self._id = next(_ids)
+        self._window = window
+        self._name = name
+        self._file_name = None
+        self._settings = Settings()
+        self._sel = Selection()
+        self._sel.add(Region(0))
+        self._read_only = False
+        self._change_count = 0
+        self._status = {}
+        self._regions = {}
+        self._popup = None
+        self._viewport = (0.0, 0.0)
+        self.set_text(text)
+        if window:
+            window._views.append(self)
+
+    def set_text(self, text):
+        self._lines = text.split('\n')
+        # _starts[i] is the offset of line i, valid for every line it covers
+        self._starts = [0]
+        self._size = len(text)
+
+    # offsets
+    def _extend(self, row=-1, point=-1):
+        starts, lines = self._starts, self._lines
+        n = len(starts)
+        pos = starts[-1] + len(lines[n - 1]) + 1
+        while n < len(lines) and (n <= row or pos <= point):
+            starts.append(pos)
+            pos += len(lines[n]) + 1
+            n += 1
+
+    def _invalidate(self, row):
+        del self._starts[row + 1:]
+
+    def text_point(self, row, col):
+        row = min(max(row, 0), len(self._lines) - 1)
+        if row >= len(self._starts):
+            self._extend(row=row)
+        return min(self._starts[row] + col, self._size)
+
+    def rowcol(self, point):
+        point = min(max(point, 0), self._size)
+        if self._starts[-1] + len(self._lines[len(self._starts) - 1]) < point:
+            self._extend(point=point)
+        row = bisect.bisect_right(self._starts, point) - 1
+        return row, point - self._starts[row]
+
+    # text
+    def id(self):
+        return self._id
+
+    def buffer_id(self):
+        return self._id
+
+    def size(self):
+        return self._size
+
+    def substr(self, x):
+        if isinstance(x, Region):
+            a, b = x.begin(), x.end()
+            if a == 0 and b >= self._size:
+                return '\n'.join(self._lines)
+            ra, ca = self.rowcol(a)
+            rb, cb = self.rowcol(b)
+            if ra == rb:
+                return self._lines[ra][ca:cb]
+            return '\n'.join([self._lines[ra][ca:]] + self._lines[ra + 1:rb] + [self._lines[rb][:cb]])
+        row, col = self.rowcol(x)
+        line = self._lines[row]
+        return line[col] if col < len(line) else '\n' if row < len(self._lines) - 1 else '\x00'
+
+    def _splice(self, a, b, text):
+        a, b = min(a, b), max(a, b)
+        ra, ca = self.rowcol(a)
+        rb, cb = self.rowcol(b)
+        lines = self._lines
+        lines[ra:rb + 1] = (lines[ra][:ca] + text + lines[rb][cb:]).split('\n')
+        self._invalidate(ra)
+        delta = len(text) - (b - a)
+        self._size += delta
+        self._change_count += 1
+        # regions move with the text after the edit, like Sublime's
+        def move(pt):
+            return pt + delta if pt >= b else min(pt, a)
+        for key, regions in self._regions.items():
+            self._regions[key] = [Region(move(r.a), move(r.b)) for r in regions]
+
+    def insert(self, edit, point, text):
+        self._splice(point, point, text)
+        return len(text)
+
+    def erase(self, edit, region):
+        self._splice(region.a, region.b, '')
+
+    def replace(self, edit, region, text):
+        self._splice(region.a, region.b, text)
+
+    def change_count(self):
+        return self._change_count
+
+    def line(self, x):
+        if isinstance(x, Region):
+            return Region(self.line(x.begin()).a, self.line(x.end()).b)
+        row, _ = self.rowcol(x)
+        start = self.text_point(row, 0)
+        return Region(start, start + len(self._lines[row]))
+
+    def full_line(self, x):
+        r = self.line(x)
+        return Region(r.a, min(r.b + 1, self._size))
+
+    def lines(self, region):
+        ra, _ = self.rowcol(region.begin())
+        rb, _ = self.rowcol(region.end())
+        return [self.line(self.text_point(row, 0)) for row in range(ra, rb + 1)]
+
+    def word(self, x):
+        point = x.begin() if isinstance(x, Region) else x
+        line = self.line(point)
+        text = self.substr(line)
+        col = point - line.a
+        start = col
+        while start > 0 and (text[start - 1].isalnum() or text[start - 1] == '_'):
+            start -= 1
+        end = col
+        while end < len(text) and (text[end].isalnum() or text[end] == '_'):
+            end += 1
+        return Region(line.a + start, line.a + end)
+
+    def extract_completions(self, prefix, point=-1):
+        words = set(re.findall(r'\b{}\w+'.format(re.escape(prefix)), '\n'.join(self._lines)))
+        return sorted(words)
+
+    def sel(self):
+        return self._sel
+
+    def settings(self):
+        return self._settings
+
+    def window(self):
+        return self._window
+
+    def file_name(self):
+        return self._file_name
+
+    def name(self):
+        return self._name
+
+    def set_name(self, name):
+        self._name = name
+
+    def is_read_only(self):
+        return self._read_only
+
+    def set_read_only(self, read_only):
+        self._read_only = read_only
+
+    def is_scratch(self):
+        return False
+
+    def run_command(self, cmd, args=None):
+        cls = sublime_plugin.commands.get(cmd)
+        if cls and issubclass(cls, sublime_plugin.TextCommand):
+            cls(self).run(object(), **(args or {}))
+
+    # status, regions, popups
+    def set_status(self, key, value):
+        self._status[key] = value
+
+    def erase_status(self, key):
+        self._status.pop(key, None)
+
+    def get_status(self, key):
+        return self._status.get(key, '')
+
+    def add_regions(self, key, regions, scope='', icon='', flags=0):
+        self._regions[key] = list(regions)
+
+    def erase_regions(self, key):
+        self._regions.pop(key, None)
+
+    def get_regions(self, key):
+        return self._regions.get(key, [])
+
+    def show_popup(self, content, flags=0, location=-1, max_width=320, max_height=240, on_navigate=None, on_hide=None):
+        self._popup = content
+
+    def update_popup(self, content):
+        self._popup = content
+
+    def hide_popup(self):
+        self._popup = None
+
+    def is_popup_visible(self):
+        return self._popup is not None
+
+    # layout, a fixed width font in a fixed size viewport
+    def em_width(self):
+        return 8.0
+
+    def line_height(self):
+        return 16.0
+
+    def viewport_position(self):
+        return self._viewport
+
+    def set_viewport_position(self, xy, animate=True):
+        self._viewport = xy
+
+    def viewport_extent(self):
+        return (960.0, 720.0)
+
+    def text_to_layout(self, point):
+        row, col = self.rowcol(point)
+        return (col * self.em_width(), row * self.line_height())
+
+    def layout_to_text(self, xy):
+        return self.text_point(int(xy[1] / self.line_height()), int(xy[0] / self.em_width()))
+
+    def show(self, x, show_surrounds=True):
+        pass
+
+
+class Window:
+    def __init__(self):
+        self._id = next(_ids)
+        self._views = []
+        self._active = None
+        self._panel = None
+
+    def id(self):
+        return self._id
+
+    def views(self):
+        return list(self._views)
+
+    def active_view(self):
+        return self._active or (self._views[0] if self._views else None)
+
+    def focus_view(self, view):
+        self._active = view
+
+    def new_file(self):
+        view = View(self)
+        self._active = view
+        return view
+
+    def folders(self):
+        return []
+
+    def project_file_name(self):
+        return None
+
+    def active_panel(self):
+        return self._panel
+
+    def show_input_panel(self, caption, initial, on_done, on_change, on_cancel):
+        self._panel = 'input'
+        return View(None, initial)
+
+    def run_command(self, cmd, args=None):
+        if cmd == 'hide_panel':
+            self._panel = None
+            return
+        cls = sublime_plugin.commands.get(cmd)
+        if cls and issubclass(cls, sublime_plugin.WindowCommand):
+            cls(self).run(**(args or {}))
+
+
+# module functions
+def version():
+    return VERSION
+
+
+def platform():
+    return {'darwin': 'osx', 'win32': 'windows'}.get(sys.platform, 'linux')
+
+
+def arch():
+    return 'x64'
+
+
+def cache_path():
+    return os.path.join(tempfile.gettempdir(), 'sublime_stub', 'Cache')
+
+
+def packages_path():
+    return os.path.join(tempfile.gettempdir(), 'sublime_stub', 'Packages')
+
+
+def load_settings(name):
+    if name not in _settings:
+        _settings[name] = Settings()
+    return _settings[name]
+
+
+def save_settings(name):
+    pass
+
+
+def set_timeout(fn, delay=0):
+    with _timeouts_lock:
+        _timeouts.append(fn)
+
+
+set_timeout_async = set_timeout
+
+
+def run_timeouts(limit=100):
+    # runs queued callbacks, including ones they queue, up to limit rounds
+    for i in range(limit):
+        with _timeouts_lock:
+            todo = list(_timeouts)
+            del _timeouts[:]
+        if not todo:
+            return
+        for fn in todo:
+            fn()
+
+
+def windows():
+    if not _windows:
+        _windows.append(Window())
+    return list(_windows)
+
+
+def active_window():
+    return windows()[0]
+
+
+def status_message(msg):
+    pass
+
+
+def error_message(msg):
+    print('sublime error:', msg)
+
+
+def message_dialog(msg):
+    pass
+
+
+def run_command(cmd, args=None):
+    cls = sublime_plugin.commands.get(cmd)
+    if cls and issubclass(cls, sublime_plugin.ApplicationCommand):
+        cls().run(**(args or {}))
+
+
+# sublime_plugin
+def _command_name(name):
+    if name.endswith('Command'):
+        name = name[:-len('Command')]
+    return re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', name).lower()
+
+
+class _CommandMeta(type):
+    def __init__(cls, name, bases, attrs):
+        super().__init__(name, bases, attrs)
+        if attrs.get('__module__') != __name__:
+            sublime_plugin.commands[_command_name(name)] = cls
+
+
+class _Command(metaclass=_CommandMeta):
+    def is_enabled(self, *args, **kwargs):
+        return True
+
+    def is_visible(self, *args, **kwargs):
+        return True
+
+
+class _TextCommand(_Command):
+    def __init__(self, view):
+        self.view = view
+
+
+class _WindowCommand(_Command):
+    def __init__(self, window):
+        self.window = window
+
+
+class _ApplicationCommand(_Command):
+    pass
+
+
+class _EventListener:
+    pass
+
+
+class _ViewEventListener:
+    def __init__(self, view):
+        self.view = view
+
+
+def _on_query_completions(view_id, prefix, locations):
+    return [], 0
+
+
+sublime = sys.modules[__name__]
+sublime_plugin = types.ModuleType('sublime_plugin')
+sublime_plugin.commands = {}
+sublime_plugin.TextCommand = _TextCommand
+sublime_plugin.WindowCommand = _WindowCommand
+sublime_plugin.ApplicationCommand = _ApplicationCommand
+sublime_plugin.EventListener = _EventListener
+sublime_plugin.ViewEventListener = _ViewEventListener
+sublime_plugin.on_query_completions = _on_query_completions
+
+
+def install():
+    sys.modules['sublime'] = sublime
+    sys.modules['sublime_plugin'] = sublime_plugin
@@ -0,0 +1,389 @@
+# suite.py
+# benchmarks the plugin's hot paths against a stubbed Sublime (bench/sublime_stub.py) and a fake nvim (bench/fakevim.py)
+#
+# usage: python3 bench/suite.py [--sizes 1000,10000] [--content ascii,cjk,tabs] [--only sync_to_vim,visual]
+#                               [--recording FILE] [--save FILE] [--baseline FILE] [--tolerance 0.25]
+# run it from a checkout named ActualVim, with a python that can import the vendored client (<= 3.6)
+#
+# each benchmark is run per file size and line content, and reports time per op, throughput in its unit,
+# and the peak memory and retained blocks tracemalloc sees during one op.
+# --save writes the results as JSON, --baseline compares against such a file and exits 1 on regressions.
+
+import argparse
+import gc
+import json
+import os
+import queue
+import stat
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ActualVim.bench import sublime_stub
+sublime_stub.install()
+
+import sublime
+from ActualVim.bench import fakevim
+from ActualVim.lib import msgpack
+from ActualVim import neo
+from ActualVim import replay
+from ActualVim import settings
+from ActualVim.screen import Screen
+from ActualVim.view import ActualVim
+
+SIZES = (1000, 10000, 100000, 1000000)
+
+CONTENT = {
+    'ascii': lambda i: 'line {} of the benchmark text, with some words to select and move over'.format(i),
+    'cjk': lambda i: '第{}行 日本語のテキストと中文文本，還有한국어 텍스트'.format(i),
+    'tabs': lambda i: '\t\tif (value_{0} > 0) {{\t\t// {0}\t}}'.format(i),
+}
+
+# plugin settings for the run: no spare nvim, no size limit, flush frames on the next tick
+SETTINGS = {
+    'standby': False,
+    'large_file_disable': {'bytes': -1, 'lines': -1},
+    'ui_fps': 0,
+    'neovim_args': [],
+}
+
+SCREEN = (160, 50)
+
+
+def make_text(content, size):
+    line = CONTENT[content]
+    return '\n'.join(line(i) for i in range(size))
+
+
+class Bench:
+    # one benchmark: setup(ctx) returns (op, units per op), per_size benchmarks run for every file size
+    def __init__(self, name, unit, setup, per_size=True, needs_vim=False):
+        self.name = name
+        self.unit = unit
+        self.setup = setup
+        self.per_size = per_size
+        self.needs_vim = needs_vim
+
+
+class Context:
+    def __init__(self, content, size, recording=None):
+        self.content = content
+        self.size = size
+        self.recording = recording
+        self._text = None
+        self._view = None
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = make_text(self.content, self.size or 100)
+        return self._text
+
+    @property
+    def lines(self):
+        return self.text.split('\n')
+
+    def view(self):
+        # a view activated like a fresh one, then given the text on the Sublime side only:
+        # outside Sublime the client falls back to pure python msgpack, which can't carry the
+        # initial lines event of a large file within the rpc timeout. only sync_to_vim needs
+        # nvim to have the text, and it sends all of it anyway.
+        if self._view is None:
+            window = sublime.active_window()
+            view = sublime.View(window, self.lines[0], name='bench')
+            window.focus_view(view)
+            av = ActualVim.get(view)
+            av.activate()
+            sublime_stub.run_timeouts()
+            view.set_text(self.text)
+            av.mark_changed()
+            self._view = av
+        return self._view
+
+    def close(self):
+        if self._view is not None:
+            self._view.close()
+            self._view = None
+            sublime_stub.run_timeouts()
+
+
+# msgpack
+def setup_pack(ctx):
+    msg = [2, 'nvim_buf_lines_event', [1, 100, 0, -1, ctx.lines, False]]
+    return lambda: msgpack.packb(msg), ctx.size
+
+
+def setup_unpack(ctx):
+    data = msgpack.packb([2, 'nvim_buf_lines_event', [1, 100, 0, -1, ctx.lines, False]])
+
+    def op():
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(data)
+        for msg in unpacker:
+            pass
+    return op, ctx.size
+
+
+# screen
+class Capture:
+    # a fakevim channel that keeps the redraw batches it's sent
+    id = 1
+    closed = False
+
+    def __init__(self):
+        self.batches = []
+
+    def send(self, msg):
+        if msg[0] == fakevim.NOTIFICATION and msg[1] == 'redraw':
+            self.batches.append(msg[2])
+
+
+def redraw_payload(ctx):
+    if ctx.recording:
+        return [msg[2] for _, msg in replay.Replay.from_file(ctx.recording).messages()
+                if msg[0] == replay.NOTIFICATION and msg[1] == 'redraw']
+    fake = fakevim.FakeNvim(redraw_rows=0)
+    capture = Capture()
+    fake.nvim_buf_set_lines(capture, 0, 0, -1, False, ctx.lines[:SCREEN[1] * 2])
+    fake.nvim_ui_attach(capture, SCREEN[0], SCREEN[1], {})
+    for keys in ('jjjj', 'A', 'typing at the end', '<esc>', 'kkvjjj', '<esc>', 'o', 'a new line', '<esc>', 'x'):
+        fake.nvim_input(capture, keys)
+    fake.flush()
+    return capture.batches
+
+
+def setup_redraw(ctx):
+    batches = redraw_payload(ctx)
+
+    def op():
+        screen = Screen()
+        for batch in batches:
+            screen.redraw(batch)
+    return op, sum(len(batch) for batch in batches)
+
+
+def setup_highlights(ctx):
+    # every other word highlighted, like search matches or a visual selection
+    batch = [['resize', list(SCREEN)]]
+    for y, line in enumerate(ctx.lines[:SCREEN[1]]):
+        batch.append(['cursor_goto', [y, 0]])
+        for i, word in enumerate(line[:SCREEN[0]].split(' ')):
+            batch.append(['highlight_set', [{'background': 0x444444} if i % 2 else {}]])
+            batch.append(['put'] + [[c] for c in word + ' '])
+    screen = Screen()
+    screen.redraw(batch)
+    return screen.highlights, SCREEN[1]
+
+
+# view
+def setup_visual(ctx, mode):
+    av = ctx.view()
+    mid = ctx.size // 2
+    lines = ctx.lines
+    # nvim columns are byte offsets
+    col = lambda row, i: len(lines[row][:i].encode('utf-8'))
+    sr, er = max(mid - 25, 0), min(mid + 25, ctx.size - 1)
+    a, b = (sr, col(sr, 3)), (er, col(er, 10))
+    return lambda: av.visual(mode, a, b), er - sr + 1
+
+
+def setup_sync_to_vim(ctx):
+    av = ctx.view()
+
+    def op():
+        # the text didn't change, but a bumped change count makes it look like it did
+        av.view._change_count += 1
+        av.sync_to_vim()
+    return op, ctx.size
+
+
+def setup_sync_from_vim(ctx, count):
+    av = ctx.view()
+    start = ctx.size // 2
+    end = min(start + count, ctx.size)
+    line = CONTENT[ctx.content]
+    variants = ([line(i) + ' changed' for i in range(start, end)], [line(i) for i in range(start, end)])
+    state = {'tick': 10 ** 6, 'i': 0}
+
+    def op():
+        state['tick'] += 1
+        state['i'] ^= 1
+        av.sync_from_vim(edit=object(), lines_event=(state['tick'], start, end, variants[state['i']]))
+        av.mark_changed()
+    return op, end - start
+
+
+BENCHES = [
+    Bench('msgpack_pack', 'lines', setup_pack),
+    Bench('msgpack_unpack', 'lines', setup_unpack),
+    Bench('screen_redraw', 'events', setup_redraw, per_size=False),
+    Bench('screen_highlights', 'rows', setup_highlights, per_size=False),
+    Bench('visual_char', 'lines', lambda ctx: setup_visual(ctx, 'v'), needs_vim=True),
+    Bench('visual_line', 'lines', lambda ctx: setup_visual(ctx, 'V'), needs_vim=True),
+    Bench('visual_block', 'lines', lambda ctx: setup_visual(ctx, '\x16'), needs_vim=True),
+    Bench('visual_normal', 'lines', lambda ctx: setup_visual(ctx, 'n'), needs_vim=True),
+    Bench('sync_to_vim', 'lines', setup_sync_to_vim, needs_vim=True),
+    Bench('sync_from_vim_line', 'lines', lambda ctx: setup_sync_from_vim(ctx, 1), needs_vim=True),
+    Bench('sync_from_vim_block', 'lines', lambda ctx: setup_sync_from_vim(ctx, 500), needs_vim=True),
+]
+
+
+def measure(op, min_time, max_iterations):
+    op()
+    times = []
+    deadline = time.time() + min_time
+    while len(times) < max_iterations and (not times or time.time() < deadline):
+        start = time.time()
+        op()
+        times.append(time.time() - start)
+        # the plugin queues ui work behind each op, don't let it pile up
+        sublime_stub.run_timeouts()
+    return sum(times) / len(times), len(times)
+
+
+def allocations(op):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        op()
+        _, peak = tracemalloc.get_traced_memory()
+        blocks = sum(s.count for s in tracemalloc.take_snapshot().statistics('filename'))
+    finally:
+        tracemalloc.stop()
+    sublime_stub.run_timeouts()
+    return peak, blocks
+
+
+def start_vim(latency):
+    # like neo._start, against fakevim through a wrapper script standing in for the nvim binary
+    fd, path = tempfile.mkstemp(prefix='fakevim-', suffix='.sh')
+    with os.fdopen(fd, 'w') as f:
+        f.write('#!/bin/sh\nexec "{}" "{}" "$@"\n'.format(sys.executable, fakevim.__file__))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    if latency:
+        settings.set('neovim_args', ['--latency', str(latency)])
+    neo.NEOVIM_PATH = path
+    neo._start()
+    sublime_stub.run_timeouts()
+    if not neo._loaded:
+        raise Exception('could not start fakevim')
+    return path
+
+
+def settle(timeout=60):
+    # wait for nvim to work through requests we gave up on
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            neo.vim.nv.request('nvim_get_mode')
+            return
+        except queue.Empty:
+            pass
+
+
+def stop_vim(path):
+    if neo.pool:
+        neo.pool.quit()
+    neo._loaded = False
+    os.unlink(path)
+
+
+def compare(results, baseline, tolerance):
+    # a result regresses when its throughput drops or its retained blocks grow by more than tolerance
+    regressions = []
+    for key, new in sorted(results.items()):
+        old = baseline.get(key)
+        if not old:
+            continue
+        if new['per_s'] < old['per_s'] / (1 + tolerance):
+            regressions.append('{}: {:,.0f} -> {:,.0f} {}/s'.format(key, old['per_s'], new['per_s'], new['unit']))
+        if new['blocks'] > old['blocks'] * (1 + tolerance) + 100:
+            regressions.append('{}: {} -> {} retained blocks'.format(key, old['blocks'], new['blocks']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default=','.join(str(s) for s in SIZES), help='file sizes in lines')
+    parser.add_argument('--content', default=','.join(sorted(CONTENT)), help='line content: ' + ', '.join(sorted(CONTENT)))
+    parser.add_argument('--only', default='', help='benchmark names to run, comma separated')
+    parser.add_argument('--recording', help='rpc recording to take redraw payloads from (see replay.py)')
+    parser.add_argument('--latency', type=float, default=0, help='fakevim response latency in ms')
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds to repeat each benchmark for')
+    parser.add_argument('--max-iterations', type=int, default=1000)
+    parser.add_argument('--save', metavar='FILE', help='write results as JSON')
+    parser.add_argument('--baseline', metavar='FILE', help='compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a regression')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    contents = [c for c in args.content.split(',') if c]
+    only = set(n for n in args.only.split(',') if n)
+    benches = [b for b in BENCHES if not only or b.name in only]
+
+    settings.load()
+    for key, value in SETTINGS.items():
+        settings.set(key, value)
+    # the plugin looks for an active view when settings change and nvim loads
+    sublime.active_window().new_file()
+
+    vim_path = None
+    if any(b.needs_vim for b in benches):
+        vim_path = start_vim(args.latency)
+
+    results = {}
+    try:
+        for content in contents:
+            for size in sizes:
+                ctx = Context(content, size, args.recording)
+                for bench in benches:
+                    if not bench.per_size and size != sizes[0]:
+                        continue
+                    key = '{}/{}/{}'.format(bench.name, content, size if bench.per_size else '-')
+                    try:
+                        op, units = bench.setup(ctx)
+                        seconds, iterations = measure(op, args.min_time, args.max_iterations)
+                        peak, blocks = allocations(op)
+                    except Exception as e:
+                        # eg. an rpc timeout on a large file, report it and carry on
+                        error = 'rpc request timed out' if isinstance(e, queue.Empty) else repr(e)
+                        print('{:<42} failed: {}'.format(key, error))
+                        sublime_stub.run_timeouts()
+                        if bench.needs_vim:
+                            settle()
+                        continue
+                    results[key] = {
+                        'unit': bench.unit,
+                        'ms': seconds * 1000,
+                        'per_s': units / seconds if seconds else 0,
+                        'iterations': iterations,
+                        'peak_kb': peak / 1024,
+                        'blocks': blocks,
+                    }
+                    print('{:<42} {:>10.3f}ms {:>14,.0f} {:<6}/s  peak {:>10.1f}kB  retained {:>7} blocks'.format(
+                        key, seconds * 1000, results[key]['per_s'], bench.unit, peak / 1024, blocks))
+                ctx.close()
+    finally:
+        if vim_path:
+            stop_vim(vim_path)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print('saved results to', args.save)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        if regressions:
+            sys.exit(1)
+        print('no regressions against', args.baseline)
+
+
+if __name__ == '__main__':
+    main()
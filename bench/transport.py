@@ -0,0 +1,55 @@
+# transport.py
+# compares request round trip latency of the rpc event loop backends against an embedded nvim
+#
+# usage: python3 bench/transport.py [-n requests] [nvim command...]
+#        python3 bench/transport.py -- python3 bench/fakevim.py --embed   (without a real nvim)
+# run it from a checkout named ActualVim, with a python that can import the vendored client (<= 3.6)
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ActualVim.lib import neovim
+
+BACKENDS = ('default', 'pipe')
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def bench(backend, argv, count):
+    start = time.time()
+    nv = neovim.attach('child', argv=argv, backend=None if backend == 'default' else backend)
+    nv.request('nvim_get_api_info')
+    spawn = time.time() - start
+
+    samples = []
+    for i in range(count):
+        start = time.time()
+        nv.request('nvim_eval', '1')
+        samples.append(time.time() - start)
+
+    try:
+        nv.quit()
+    except IOError:
+        pass
+
+    print('{:>8}: spawn {:7.2f}ms, round trip mean {:.3f}ms p50 {:.3f}ms p99 {:.3f}ms'.format(
+        backend, spawn * 1000,
+        sum(samples) / len(samples) * 1000,
+        percentile(samples, 0.5) * 1000,
+        percentile(samples, 0.99) * 1000,
+    ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=2000, help='requests per backend')
+    parser.add_argument('argv', nargs='*', default=['nvim', '--embed', '-u', 'NONE', '-n'])
+    args = parser.parse_args()
+    for backend in BACKENDS:
+        bench(backend, args.argv, args.n)
@@ -0,0 +1,98 @@
+# debounce.py
+# sizes the nvim line event debounce window from measured apply cost and event rate
+
+import threading
+import time
+
+from . import settings
+
+# smoothing factor for the moving averages
+ALPHA = 0.2
+# gaps longer than this are idle time, not part of a burst
+MAX_GAP = 1.0
+
+
+def ewma(avg, sample):
+    if avg is None:
+        return sample
+    return avg + ALPHA * (sample - avg)
+
+
+class AdaptiveDebounce:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # average seconds to apply one lines event on the main thread
+        self.cost = None
+        # average seconds between incoming lines events
+        self.gap = None
+        self.last_arrival = 0
+        self.events = 0
+        self.applies = 0
+        self.apply_time = 0
+
+    @property
+    def config(self):
+        return settings.get('lines_debounce', {})
+
+    def arrived(self):
+        now = time.time()
+        with self.lock:
+            if self.last_arrival:
+                self.gap = ewma(self.gap, min(now - self.last_arrival, MAX_GAP))
+            self.last_arrival = now
+            self.events += 1
+
+    def applied(self, seconds):
+        with self.lock:
+            self.cost = ewma(self.cost, seconds)
+            self.applies += 1
+            self.apply_time += seconds
+
+    @property
+    def adaptive(self):
+        return self.config.get('adaptive', True) and self.cost is not None
+
+    @property
+    def spacing(self):
+        # minimum time between applies that keeps main thread use under target
+        target = self.config.get('target', 0.5)
+        return self.cost / max(target, 0.01)
+
+    def clamp(self, value):
+        conf = self.config
+        return max(conf.get('min', 0.002), min(value, conf.get('max', 0.25)))
+
+    @property
+    def threshold(self):
+        if not self.adaptive:
+            return self.config.get('threshold', 0.01)
+        return self.clamp(self.spacing)
+
+    @property
+    def window(self):
+        if not self.adaptive:
+            return self.config.get('timeout', 0.05)
+        # events are sparse enough to apply as they come, so keep lag minimal
+        if self.gap is not None and self.gap >= self.spacing:
+            return self.clamp(0)
+        return self.clamp(self.spacing)
+
+    @property
+    def utilization(self):
+        if self.cost is None or not self.gap:
+            return 0
+        return self.cost / self.gap
+
+    def stats(self):
+        with self.lock:
+            return {
+                'adaptive': self.adaptive,
+                'threshold_ms': self.threshold * 1000,
+                'window_ms': self.window * 1000,
+                'cost_ms': (self.cost or 0) * 1000,
+                'gap_ms': (self.gap or 0) * 1000,
+                'utilization': self.utilization,
+                'events': self.events,
+                'applies': self.applies,
+                'apply_total_ms': self.apply_time * 1000,
+            }
@@ -2,14 +2,33 @@
 # buffer editing for both ST2 and ST3 that "just works"
 
 import inspect
+import itertools
 import sublime
 import sublime_plugin
+import threading
+import traceback
+
+from .keytrace import tracer
 
 try:
     sublime.actualvim_edit_storage
 except AttributeError:
     sublime.actualvim_edit_storage = {}
 
+# Edits for a view are queued into one transaction, which a single apply_actualvim_edit
+# applies (one text command, one undo entry, one modified event)
+#   with Edit(view) as edit: ...   applied when the block exits, along with anything queued before it
+#                                  (inside a running transaction, right after the edit it came from)
+#   Edit.defer(view, func)         queued for the next tick, so edits from the frame/lines
+#                                  pipeline posted in the meantime are batched with it
+if not '_transactions' in globals():
+    _lock = threading.Lock()
+    _keys = itertools.count()
+    # view id -> Edits waiting for the next tick
+    _transactions = {}
+    # view id -> Edits of the transaction being applied, Edits submitted meanwhile join it
+    _running = {}
+
 def run_callback(func, *args, **kwargs):
     spec = inspect.getfullargspec(func)
     if spec.args or spec.varargs:
@@ -26,6 +45,108 @@ class EditFuture:
         return self.func(view, edit)
 
 
+def span(region):
+    if isinstance(region, int):
+        return region, region
+    if isinstance(region, (tuple, list)):
+        return min(region), max(region)
+    return region.begin(), region.end()
+
+
+class Compactor:
+    # composes text steps into sorted, non-overlapping replacements of the view as it was
+    # before them, so a run of steps costs one view call per touched span
+    def __init__(self, view):
+        self.view = view
+        # [a, b, text]: replace view[a:b] with text, in original positions
+        self.reps = []
+
+    def __bool__(self):
+        return bool(self.reps)
+
+    def size(self):
+        return self.view.size() + sum(len(t) - (b - a) for a, b, t in self.reps)
+
+    def forward(self, pos):
+        # original position -> position after the replacements so far
+        shift = 0
+        for a, b, t in self.reps:
+            if b <= pos:
+                shift += len(t) - (b - a)
+            elif a < pos:
+                # inside replaced text, land after it
+                return a + shift + len(t)
+            else:
+                break
+        return pos + shift
+
+    def resolve(self, arg, edit):
+        # futures see the view before any of our replacements were applied
+        if not isinstance(arg, EditFuture):
+            return arg
+        arg = arg.resolve(self.view, edit)
+        if isinstance(arg, int):
+            return self.forward(arg)
+        if isinstance(arg, sublime.Region):
+            return sublime.Region(self.forward(arg.a), self.forward(arg.b))
+        return arg
+
+    def add(self, step, edit):
+        args = [self.resolve(arg, edit) for arg in step.args]
+        if step.cmd == 'insert':
+            pos = min(self.size(), args[0])
+            self.replace(pos, pos, args[1])
+        elif step.cmd == 'erase':
+            self.replace(*(span(args[0]) + ('',)))
+        elif step.cmd == 'replace':
+            self.replace(*(span(args[0]) + (args[1],)))
+
+    def replace(self, ca, cb, text):
+        # ca:cb are positions in the current text, merge with any replacement they touch
+        reps = self.reps
+        shift = 0
+        i = 0
+        while i < len(reps):
+            a, b, t = reps[i]
+            if a + shift + len(t) >= ca:
+                break
+            shift += len(t) - (b - a)
+            i += 1
+        start, end = ca - shift, None
+        j = i
+        while j < len(reps):
+            a, b, t = reps[j]
+            cur_a = a + shift
+            if cur_a > cb:
+                break
+            if j == i and cur_a < ca:
+                start = a
+                text = t[:ca - cur_a] + text
+            cur_b = cur_a + len(t)
+            if cur_b > cb:
+                end = b
+                text += t[cb - cur_a:]
+            shift += len(t) - (b - a)
+            j += 1
+        if end is None:
+            end = cb - shift
+        del reps[i:j]
+        if start != end or text:
+            reps.insert(i, [start, end, text])
+
+    def apply(self, edit):
+        # bottom up, so the positions below are still valid
+        view = self.view
+        for a, b, t in reversed(self.reps):
+            if a == b:
+                view.insert(edit, a, t)
+            elif t:
+                view.replace(edit, sublime.Region(a, b), t)
+            else:
+                view.erase(edit, sublime.Region(a, b))
+        self.reps = []
+
+
 class EditStep:
     def __init__(self, cmd, *args):
         self.cmd = cmd
@@ -72,8 +193,9 @@ class Edit:
 
     @classmethod
     def defer(cls, view, func):
-        with Edit(view) as edit:
-            edit.callback(func)
+        edit = Edit(view)
+        edit.callback(func)
+        cls.submit(edit)
 
     def step(self, cmd, *args):
         step = EditStep(cmd, *args)
@@ -109,7 +231,8 @@ class Edit:
         self.callback(select)
 
     def append(self, text):
-        self.insert(self.view.size(), text)
+        # resolved when applied, earlier edits in the transaction may change the size
+        self.insert(self.future(lambda view, edit: view.size()), text)
 
     def run(self, view, edit):
         read_only = False
@@ -117,11 +240,21 @@ class Edit:
             read_only = True
             view.set_read_only(False)
 
-        for step in self.steps:
-            step.run(view, edit)
-
-        if read_only:
-            view.set_read_only(True)
+        # text steps between callbacks are compacted, callbacks see the view with everything before them applied
+        text = Compactor(view)
+        try:
+            for step in self.steps:
+                if step.cmd == 'callback':
+                    if text:
+                        text.apply(edit)
+                    step.run(view, edit)
+                else:
+                    text.add(step, edit)
+            if text:
+                text.apply(edit)
+        finally:
+            if read_only:
+                view.set_read_only(True)
 
     def __enter__(self):
         return self
@@ -133,11 +266,74 @@ class Edit:
             self.run(edit)
             view.end_edit(edit)
         else:
-            key = str(hash(tuple(self.steps)))
-            sublime.actualvim_edit_storage[key] = self.run
+            # callers read the view right after the block, so it's applied now
+            self.submit(self)
+            self.commit(view)
+
+    @staticmethod
+    def submit(edit):
+        vid = edit.view.id()
+        with _lock:
+            running = _running.get(vid)
+            if running is not None:
+                running.append(edit)
+                return
+            pending = _transactions.get(vid)
+            if pending is not None:
+                pending.append(edit)
+                return
+            _transactions[vid] = [edit]
+        sublime.set_timeout(lambda: Edit.commit(edit.view), 0)
+
+    @staticmethod
+    def commit(view):
+        # applies the view's pending transaction now, if there is one
+        vid = view.id()
+        with _lock:
+            if vid not in _transactions or vid in _running:
+                return
+            key = '{}:{}'.format(vid, next(_keys))
+        sublime.actualvim_edit_storage[key] = apply_transaction
+        try:
             view.run_command('apply_actualvim_edit', {'key': key})
+        finally:
+            # the command doesn't run if the view went away
+            if sublime.actualvim_edit_storage.pop(key, None):
+                with _lock:
+                    _transactions.pop(vid, None)
+
+
+def apply_transaction(view, edit):
+    vid = view.id()
+    with _lock:
+        edits = _transactions.pop(vid, None)
+        if edits is None:
+            return
+        _running[vid] = edits
+    i = 0
+    try:
+        while True:
+            with _lock:
+                if i >= len(edits):
+                    break
+                e = edits[i]
+            i += 1
+            try:
+                e.run(view, edit)
+            except Exception:
+                # don't let one broken edit drop the rest of the transaction
+                traceback.print_exc()
+    finally:
+        with _lock:
+            _running.pop(vid, None)
+            rest = edits[i:]
+        for e in rest:
+            Edit.submit(e)
 
 
 class apply_actualvim_edit(sublime_plugin.TextCommand):
     def run(self, edit, key):
-        sublime.actualvim_edit_storage.pop(key)(self.view, edit)
+        func = sublime.actualvim_edit_storage.pop(key, None)
+        if func:
+            func(self.view, edit)
+        tracer.finish(self.view.id())
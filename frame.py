@@ -0,0 +1,99 @@
+# frame.py
+# coalesces UI updates from vim into at most one edit per frame
+
+import sublime
+import threading
+import time
+import traceback
+
+from . import settings
+from .edit import Edit, run_callback
+
+# mailbox slots are flushed in this order
+# selection goes before viewport, as scrolling checks where the caret ended up
+SLOTS = ('update', 'selection', 'viewport', 'highlights', 'status')
+
+# how many times a flush will pick up work queued by its own jobs before yielding
+MAX_ROUNDS = 4
+
+
+class FrameScheduler:
+    def __init__(self, view):
+        self.view = view
+        self.lock = threading.Lock()
+        # ordered jobs (text edits), always run
+        self.queue = []
+        # latest-wins jobs, stale ones are dropped
+        self.mailbox = {}
+        self.scheduled = False
+        self.last_flush = 0
+        self.dropped = 0
+
+    @property
+    def interval(self):
+        fps = settings.get('ui_fps', 60)
+        if not fps or fps <= 0:
+            return 0
+        return 1.0 / fps
+
+    def post(self, slot, func):
+        with self.lock:
+            if slot in self.mailbox:
+                self.dropped += 1
+            self.mailbox[slot] = func
+            self._schedule()
+
+    def defer(self, func):
+        with self.lock:
+            self.queue.append(func)
+            self._schedule()
+
+    # must hold self.lock
+    def _schedule(self):
+        if self.scheduled:
+            return
+        self.scheduled = True
+        delay = self.last_flush + self.interval - time.time()
+        sublime.set_timeout(self.flush, max(0, int(delay * 1000)))
+
+    def _take(self):
+        with self.lock:
+            jobs = self.queue
+            jobs += [self.mailbox.pop(slot) for slot in SLOTS if slot in self.mailbox]
+            jobs += list(self.mailbox.values())
+            self.queue = []
+            self.mailbox = {}
+            if not jobs:
+                self.scheduled = False
+            return jobs
+
+    def flush(self):
+        self.last_flush = time.time()
+        jobs = self._take()
+        if not jobs:
+            return
+
+        def run(view, edit):
+            todo = jobs
+            for i in range(MAX_ROUNDS):
+                for job in todo:
+                    try:
+                        run_callback(job, view, edit)
+                    except Exception:
+                        traceback.print_exc()
+                if i == MAX_ROUNDS - 1:
+                    break
+                todo = self._take()
+                if not todo:
+                    break
+
+        try:
+            # we're already on a tick, so apply now along with any other edits queued for the view
+            Edit.defer(self.view, run)
+            Edit.commit(self.view)
+        finally:
+            # anything queued after the last round goes in the next frame
+            with self.lock:
+                self.scheduled = False
+                if self.queue or self.mailbox:
+                    self._schedule()
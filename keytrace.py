@@ -0,0 +1,152 @@
+# keytrace.py
+# keystroke latency tracing, from the keypress command to the edit that shows its result
+#
+# a trace is started per key and each stage marks the time spent since the previous mark:
+#   queue       waiting for earlier keys (ActualVim.press)
+#   viewport    syncing the sublime viewport to vim
+#   input       nvim_input
+#   mode check  nvim_get_mode / readiness probe
+#   status      fetching cursor/mode status from vim
+#   sync        applying buffer text to the view
+#   selection   applying the selection to the view
+#   apply       the rest of the edit command, until the key is on screen
+
+import collections
+import threading
+import time
+
+from . import settings
+
+# how many finished keys to keep
+RING_SIZE = 512
+
+INSERT_MODES = ('i', 'R')
+VISUAL_MODES = ('v', 'V', '\x16')
+
+
+def mode_class(mode):
+    mode = mode or 'n'
+    if mode[0] in INSERT_MODES:
+        return 'insert'
+    elif mode[0] in VISUAL_MODES:
+        return 'visual'
+    return 'normal'
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+class KeyTrace:
+    __slots__ = ('view_id', 'key', 'mode', 'size', 'start', 'last', 'phases')
+
+    def __init__(self, view_id, key, mode, size):
+        self.view_id = view_id
+        self.key = key
+        self.mode = mode
+        self.size = size
+        self.start = self.last = time.time()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.time()
+        self.phases.append((phase, (now - self.last) * 1000))
+        self.last = now
+
+    def has(self, phase):
+        return any(name == phase for name, _ in self.phases)
+
+    @property
+    def total(self):
+        return (self.last - self.start) * 1000
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'mode': self.mode,
+            'size': self.size,
+            'total_ms': self.total,
+            'phases': self.phases,
+        }
+
+
+class Tracer:
+    def __init__(self, size=RING_SIZE):
+        self.lock = threading.Lock()
+        self.ring = collections.deque(maxlen=size)
+        # keys are handled one at a time, so only the newest key is traced
+        self.current = None
+
+    @property
+    def enabled(self):
+        return settings.get('key_trace', False)
+
+    def begin(self, view_id, key, mode, size):
+        if not self.enabled:
+            return
+        with self.lock:
+            if self.current:
+                # the previous key never reached the screen (nothing to draw, or we missed it)
+                self.current.mark('superseded')
+                self.ring.append(self.current)
+            self.current = KeyTrace(view_id, key, mode_class(mode), size)
+
+    def mark(self, phase, view_id=None):
+        with self.lock:
+            trace = self.current
+            if trace and (view_id is None or view_id == trace.view_id):
+                trace.mark(phase)
+
+    def finish(self, view_id, after='selection'):
+        # the key is done once an edit applied its selection
+        with self.lock:
+            trace = self.current
+            if trace and trace.view_id == view_id and trace.has(after):
+                trace.mark('apply')
+                self.ring.append(trace)
+                self.current = None
+
+    def clear(self):
+        with self.lock:
+            self.ring.clear()
+            self.current = None
+
+    def summary(self):
+        with self.lock:
+            traces = [t for t in self.ring if not t.has('superseded')]
+        by_mode = collections.defaultdict(list)
+        for t in traces:
+            by_mode[t.mode].append(t)
+
+        out = {}
+        for mode, items in by_mode.items():
+            totals = [t.total for t in items]
+            phases = collections.defaultdict(list)
+            for t in items:
+                for name, ms in t.phases:
+                    phases[name].append(ms)
+            out[mode] = {
+                'keys': len(items),
+                'p50_ms': percentile(totals, 0.5),
+                'p95_ms': percentile(totals, 0.95),
+                'p99_ms': percentile(totals, 0.99),
+                'max_ms': max(totals),
+                'phases': {name: {
+                    'p50_ms': percentile(samples, 0.5),
+                    'p95_ms': percentile(samples, 0.95),
+                    'p99_ms': percentile(samples, 0.99),
+                } for name, samples in phases.items()},
+            }
+        return out
+
+    def slowest(self, n=10):
+        with self.lock:
+            traces = list(self.ring)
+        traces.sort(key=lambda t: t.total, reverse=True)
+        return [t.to_dict() for t in traces[:n]]
+
+if not 'tracer' in globals():
+    tracer = Tracer()
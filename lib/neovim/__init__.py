@@ -2,6 +2,7 @@
 
 Client library for talking with Nvim processes via it's msgpack-rpc API.
 """
+import importlib
 import os
 import sys
 
@@ -9,20 +10,50 @@ from .api import Nvim
 from .compat import IS_PYTHON3
 from .msgpack_rpc import (ErrorResponse, child_session, socket_session,
                           stdio_session, tcp_session)
-from .plugin import (Host, autocmd, command, decode, encoding, function,
-                     plugin, rpc_export, shutdown_hook)
 from .util import Version
 
 
 __all__ = ('tcp_session', 'socket_session', 'stdio_session', 'child_session',
            'start_host', 'autocmd', 'command', 'encoding', 'decode',
            'function', 'plugin', 'rpc_export', 'Host', 'Nvim', 'VERSION',
-           'shutdown_hook', 'attach', 'ErrorResponse')
+           'shutdown_hook', 'attach', 'ErrorResponse', 'concurrent')
 
 
 VERSION = Version(major=0, minor=1, patch=14, prerelease="dev")
 
 
+def _lazy_plugin(name):
+    """Defer importing the plugin host subpackage until it is used.
+
+    Clients that only talk to Nvim never need the plugin host, so the
+    decorators and `Host` are thin wrappers that import it on first call and
+    then replace themselves with the real objects.
+    """
+    def wrapper(*args, **kwargs):
+        module = importlib.import_module('.plugin', __name__)
+        # importing the subpackage rebinds `plugin` here, so restore the
+        # decorator along with the rest of the names
+        globals().update((n, getattr(module, n)) for n in _PLUGIN_NAMES)
+        return getattr(module, name)(*args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+
+_PLUGIN_NAMES = ('Host', 'autocmd', 'command', 'concurrent', 'decode',
+                 'encoding', 'function', 'plugin', 'rpc_export',
+                 'shutdown_hook')
+Host = _lazy_plugin('Host')
+autocmd = _lazy_plugin('autocmd')
+command = _lazy_plugin('command')
+concurrent = _lazy_plugin('concurrent')
+decode = _lazy_plugin('decode')
+encoding = _lazy_plugin('encoding')
+function = _lazy_plugin('function')
+plugin = _lazy_plugin('plugin')
+rpc_export = _lazy_plugin('rpc_export')
+shutdown_hook = _lazy_plugin('shutdown_hook')
+
+
 def start_host(session=None):
     """Promote the current process into python plugin host for Nvim.
 
@@ -77,7 +108,7 @@ def start_host(session=None):
 
 
 def attach(session_type, address=None, port=None,
-           path=None, argv=None, decode=None):
+           path=None, argv=None, decode=None, backend=None):
     """Provide a nicer interface to create python api sessions.
 
     Previous machinery to create python api sessions is still there. This only
@@ -93,11 +124,14 @@ def attach(session_type, address=None, port=None,
         nvim = attach('socket', path=<path>)
         nvim = attach('child', argv=<argv>)
         nvim = attach('stdio')
+
+    `backend` picks the event loop implementation for child and socket
+    sessions, eg. 'pipe'. The default is pyuv or asyncio.
     """
     session = (tcp_session(address, port) if session_type == 'tcp' else
-               socket_session(path) if session_type == 'socket' else
+               socket_session(path, backend) if session_type == 'socket' else
                stdio_session() if session_type == 'stdio' else
-               child_session(argv) if session_type == 'child' else
+               child_session(argv, backend) if session_type == 'child' else
                None)
 
     if not session:
@@ -145,11 +145,15 @@ class Nvim(object):
             return walk(self._from_nvim, msg)
 
     def run_loop(self, request_cb, notification_cb,
-                 setup_cb=None, err_cb=None):
+                 setup_cb=None, err_cb=None, dispatch_key=None):
         """Run the event loop to receive requests and notifications from Nvim.
 
         This should not be called from a plugin running in the host, which
         already runs the loop and dispatches events to plugins.
+
+        `dispatch_key(name, first_arg)` may return a key to handle a message
+        in order with others sharing that key, but concurrently with other
+        keys. Messages keyed None are all handled in order.
         """
         if err_cb is None:
             err_cb = sys.stderr.write
@@ -178,12 +182,40 @@ class Nvim(object):
                 self._err_cb(msg)
                 raise
 
-        self._session.run(filter_request_cb, filter_notification_cb, setup_cb)
+        def filter_dispatch_key(name, args):
+            first = self._from_nvim(args[0]) if args else None
+            return dispatch_key(self._from_nvim(name), first)
+
+        self._session.run(filter_request_cb, filter_notification_cb, setup_cb,
+                          filter_dispatch_key if dispatch_key else None)
+
+    def set_metrics(self, metrics):
+        """Record rpc traffic to a `msgpack_rpc.RpcMetrics`, or stop if None."""
+        self._session.set_metrics(metrics)
+
+    def start_recording(self, f):
+        """Record all rpc traffic to the binary file `f`.
+
+        See `msgpack_rpc.msgpack_stream` for the format.
+        """
+        self._session.start_recording(f)
+
+    def stop_recording(self):
+        """Stop recording, returns the file that was being written."""
+        return self._session.stop_recording()
 
     def stop_loop(self):
         """Stop the event loop being started with `run_loop`."""
         self._session.stop()
 
+    def close(self):
+        """Close the connection to Nvim, leaving the Nvim process running.
+
+        This is useful with 'socket' and 'tcp' sessions, where Nvim is a
+        server that outlives this client.
+        """
+        self._session.close()
+
     def with_decode(self, decode=True):
         """Initialize a new Nvim instance."""
         return Nvim(self._session, self.channel_id,
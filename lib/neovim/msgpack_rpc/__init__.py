@@ -6,12 +6,13 @@ code here should work with other msgpack-rpc servers.
 """
 from .async_session import AsyncSession
 from .event_loop import EventLoop
+from .metrics import RpcMetrics
 from .msgpack_stream import MsgpackStream
-from .session import ErrorResponse, Session
+from .session import ConcurrentKey, ErrorResponse, Session
 
 
 __all__ = ('tcp_session', 'socket_session', 'stdio_session', 'child_session',
-           'ErrorResponse')
+           'ConcurrentKey', 'ErrorResponse', 'RpcMetrics')
 
 
 def session(transport_type='stdio', *args, **kwargs):
@@ -27,9 +28,9 @@ def tcp_session(address, port=7450):
     return session('tcp', address, port)
 
 
-def socket_session(path):
+def socket_session(path, backend=None):
     """Create a msgpack-rpc session from a unix domain socket."""
-    return session('socket', path)
+    return session('socket', path, backend=backend)
 
 
 def stdio_session():
@@ -37,6 +38,6 @@ def stdio_session():
     return session('stdio')
 
 
-def child_session(argv):
+def child_session(argv, backend=None):
     """Create a msgpack-rpc session from a new Nvim instance."""
-    return session('child', argv)
+    return session('child', argv, backend=backend)
@@ -18,6 +18,7 @@ class AsyncSession(object):
         self._next_request_id = 1
         self._pending_requests = {}
         self._request_cb = self._notification_cb = None
+        self._metrics = None
         self._lock = threading.Lock()
         self._handlers = {
             0: self._on_request,
@@ -29,6 +30,19 @@ class AsyncSession(object):
         """Wrapper around `MsgpackStream.threadsafe_call`."""
         self._msgpack_stream.threadsafe_call(fn)
 
+    def set_metrics(self, metrics):
+        """Record traffic to a `RpcMetrics` instance, or stop if None."""
+        self._metrics = metrics
+        self._msgpack_stream.set_metrics(metrics)
+
+    def start_recording(self, f):
+        """Wrapper around `MsgpackStream.start_recording`."""
+        self._msgpack_stream.start_recording(f)
+
+    def stop_recording(self):
+        """Wrapper around `MsgpackStream.stop_recording`."""
+        return self._msgpack_stream.stop_recording()
+
     def request(self, method, args, response_cb):
         """Send a msgpack-rpc request to Nvim.
 
@@ -39,6 +53,8 @@ class AsyncSession(object):
         with self._lock:
             request_id = self._next_request_id
             self._next_request_id = request_id + 1
+            if self._metrics:
+                self._metrics.request_sent(request_id, method)
             self._msgpack_stream.send([0, request_id, method, args])
             self._pending_requests[request_id] = response_cb
 
@@ -49,6 +65,8 @@ class AsyncSession(object):
         Nvim. This will have the same effect as a request, but no response
         will be recieved
         """
+        if self._metrics:
+            self._metrics.notification_sent(method)
         self._msgpack_stream.send([2, method, args])
 
     def run(self, request_cb, notification_cb):
@@ -63,11 +81,17 @@ class AsyncSession(object):
         self._msgpack_stream.run(self._on_message)
         self._request_cb = None
         self._notification_cb = None
+        if self._metrics:
+            self._metrics.closed()
 
     def stop(self):
         """Stop the event loop."""
         self._msgpack_stream.stop()
 
+    def close(self):
+        """Close the underlying connection."""
+        self._msgpack_stream.close()
+
     def _on_message(self, msg):
         try:
             self._handlers.get(msg[0], self._on_invalid_message)(msg)
@@ -80,6 +104,8 @@ class AsyncSession(object):
         #   - msg[1]: id
         #   - msg[2]: method name
         #   - msg[3]: arguments
+        if self._metrics:
+            self._metrics.request_received(msg[2])
         self._request_cb(msg[2], msg[3], Response(self._msgpack_stream,
                                                   msg[1]))
 
@@ -88,6 +114,8 @@ class AsyncSession(object):
         #   - msg[1]: the id
         #   - msg[2]: error(if any)
         #   - msg[3]: result(if not errored)
+        if self._metrics:
+            self._metrics.response_received(msg[1], msg[2])
         with self._lock:
             self._pending_requests.pop(msg[1])(msg[2], msg[3])
 
@@ -95,6 +123,8 @@ class AsyncSession(object):
         # notification/event
         #   - msg[1]: event name
         #   - msg[2]: arguments
+        if self._metrics:
+            self._metrics.notification_received(msg[1], msg[2])
         self._notification_cb(msg[1], msg[2])
 
     def _on_invalid_message(self, msg):
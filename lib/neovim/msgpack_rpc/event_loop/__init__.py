@@ -1,16 +1,41 @@
 """Event loop abstraction subpackage.
 
 Tries to use pyuv as a backend, falling back to the asyncio implementation.
+The backend is imported when the first event loop is created, as the asyncio
+fallback pulls in the whole asyncio package.
+
+The `pipe` backend can be requested explicitly. It only handles `child` and
+`socket` connections, other transports use the default backend.
 """
-try:
-    # libuv is fully implemented in C, use it when available
-    from .uv import UvEventLoop
-    EventLoop = UvEventLoop
-except ImportError:
-    # asyncio(trollius on python 2) is pure python and should be more portable
-    # across python implementations
-    from .asyncio import AsyncioEventLoop
-    EventLoop = AsyncioEventLoop
-
-
-__all__ = ('EventLoop')
+
+_backend = None
+
+
+def load_backend(name=None):
+    """Import and return the event loop class, preferring pyuv."""
+    global _backend
+    if name == 'pipe':
+        from .pipe import PipeEventLoop
+        return PipeEventLoop
+    if _backend is None:
+        try:
+            # libuv is fully implemented in C, use it when available
+            from .uv import UvEventLoop
+            _backend = UvEventLoop
+        except ImportError:
+            # asyncio(trollius on python 2) is pure python and should be more
+            # portable across python implementations
+            from .asyncio import AsyncioEventLoop
+            _backend = AsyncioEventLoop
+    return _backend
+
+
+def EventLoop(transport_type, *args, **kwargs):
+    """Create an event loop, using the `backend` keyword if it applies."""
+    cls = load_backend(kwargs.pop('backend', None))
+    if transport_type not in getattr(cls, 'transports', (transport_type,)):
+        cls = load_backend()
+    return cls(transport_type, *args, **kwargs)
+
+
+__all__ = ('EventLoop', 'load_backend')
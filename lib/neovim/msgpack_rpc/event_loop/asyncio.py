@@ -17,7 +17,7 @@ from collections import deque
 
 from ActualVim.lib import asyncio
 
-from .base import BaseEventLoop
+from .base import BaseEventLoop, in_main_thread
 
 
 loop_cls = asyncio.SelectorEventLoop
@@ -94,6 +94,19 @@ class AsyncioEventLoop(BaseEventLoop, asyncio.Protocol,
             asyncio.set_event_loop(self._loop)
             startupinfo = subprocess.STARTUPINFO()
             startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        elif not in_main_thread():
+            # the child watcher installs a SIGCHLD handler, which only the main
+            # thread can do, so connect to the pipes of a plain Popen instead
+            self._proc = subprocess.Popen(argv, bufsize=0,
+                                          stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL)
+            coroutine = self._loop.connect_read_pipe(self._fact, self._proc.stdout)
+            self._loop.run_until_complete(coroutine)
+            # connected last, so it's the transport we send on
+            coroutine = self._loop.connect_write_pipe(self._fact, self._proc.stdin)
+            self._loop.run_until_complete(coroutine)
+            return
         else:
             self._child_watcher = asyncio.get_child_watcher()
             self._child_watcher.attach_loop(self._loop)
@@ -114,6 +127,9 @@ class AsyncioEventLoop(BaseEventLoop, asyncio.Protocol,
     def _stop(self):
         self._loop.stop()
 
+    def _close(self):
+        self._transport.close()
+
     def _threadsafe_call(self, fn):
         self._loop.call_soon_threadsafe(fn)
 
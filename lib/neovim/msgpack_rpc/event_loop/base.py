@@ -7,7 +7,15 @@ import threading
 # which exits the program. To be able to restore the python interpreter to it's
 # default state, we keep a reference to the default handler
 default_int_handler = signal.getsignal(signal.SIGINT)
-main_thread = threading.current_thread()
+
+
+def in_main_thread():
+    """Only the main thread can install signal handlers.
+
+    The backend may first be imported from a worker thread, so this can't be
+    captured at import time (and threading.main_thread is missing on 3.3).
+    """
+    return isinstance(threading.current_thread(), threading._MainThread)
 
 
 class BaseEventLoop(object):
@@ -40,6 +48,8 @@ class BaseEventLoop(object):
       - `_on_error(message)`: When a non-recoverable error occurs(eg:
         connection lost)
     - `_stop()`: Stop the event loop
+    - `_close()`: Close the connection to Nvim. Called in the event loop
+      thread.
     - `_interrupt(data)`: Like `stop()`, but may be called from other threads
       this.
     - `_setup_signals(signals)`: Add implementation-specific listeners for
@@ -123,10 +133,10 @@ class BaseEventLoop(object):
                 self._error = None
             raise err
         self._on_data = data_cb
-        if threading.current_thread() == main_thread:
+        if in_main_thread():
             self._setup_signals([signal.SIGINT, signal.SIGTERM])
         self._run()
-        if threading.current_thread() == main_thread:
+        if in_main_thread():
             self._teardown_signals()
             signal.signal(signal.SIGINT, default_int_handler)
         self._on_data = None
@@ -135,6 +145,14 @@ class BaseEventLoop(object):
         """Stop the event loop."""
         self._stop()
 
+    def close(self):
+        """Close the connection to Nvim.
+
+        The connection is closed from the event loop thread, so this may be
+        called from other threads. The running loop will see EOF and stop.
+        """
+        self._threadsafe_call(self._close)
+
     def _on_signal(self, signum):
         msg = 'Received {}'.format(self._signames[signum])
         if signum == signal.SIGINT and self._transport_type == 'stdio':
@@ -0,0 +1,152 @@
+"""Event loop implementation that reads and writes raw pipes directly.
+
+Instead of driving a selector loop, a dedicated thread does large blocking
+reads from the connection and feeds them straight to the data callback, and
+`send` writes to the connection directly under a lock. This avoids the
+asyncio subprocess machinery (child watcher, transports, self-pipe wakeups)
+for the common case of one embedded Nvim talking over two pipes.
+
+Only `child` and unix `socket` connections are supported.
+"""
+import os
+import signal
+import socket
+import subprocess
+import threading
+from collections import deque
+
+from .base import BaseEventLoop
+
+READ_SIZE = 256 * 1024
+
+
+class PipeEventLoop(BaseEventLoop):
+
+    """`BaseEventLoop` subclass backed by plain threads and blocking io."""
+
+    transports = ('child', 'socket')
+
+    def _init(self):
+        self._proc = None
+        self._sock = None
+        self._read = self._write = None
+        self._write_lock = threading.Lock()
+        # serializes data callbacks, threadsafe calls and callback swaps
+        self._data_lock = threading.RLock()
+        self._data_cb = None
+        self._queued_data = deque()
+        self._cond = threading.Condition()
+        self._calls = deque()
+        self._stopped = False
+        self._eof = False
+        self._signals = []
+
+    def _connect_child(self, argv):
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        self._proc = subprocess.Popen(argv, bufsize=0,
+                                      stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL,
+                                      startupinfo=startupinfo)
+        rfd = self._proc.stdout.fileno()
+        wfd = self._proc.stdin.fileno()
+        self._read = lambda: os.read(rfd, READ_SIZE)
+        self._write = lambda data: os.write(wfd, data)
+
+    def _connect_socket(self, path):
+        self._sock = sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        self._read = lambda: sock.recv(READ_SIZE)
+        self._write = sock.send
+
+    def _start_reading(self):
+        thread = threading.Thread(target=self._reader)
+        thread.daemon = True
+        thread.start()
+
+    def _reader(self):
+        while True:
+            try:
+                data = self._read()
+            except (OSError, ValueError):
+                data = b''
+            if not data:
+                break
+            with self._data_lock:
+                if self._data_cb:
+                    self._data_cb(data)
+                else:
+                    self._queued_data.append(data)
+        self._eof = True
+        self._on_error('EOF')
+        if self._proc:
+            # reap the child
+            self._proc.wait()
+
+    def _send(self, data):
+        view = memoryview(data)
+        with self._write_lock:
+            try:
+                while view:
+                    view = view[self._write(view):]
+            except OSError as e:
+                self._on_error(str(e))
+
+    def _run(self):
+        with self._cond:
+            self._stopped = self._eof
+        with self._data_lock:
+            self._data_cb = self._on_data
+            while self._queued_data:
+                self._data_cb(self._queued_data.popleft())
+        try:
+            while True:
+                with self._cond:
+                    while not (self._stopped or self._calls):
+                        self._cond.wait()
+                    if self._calls:
+                        fn = self._calls.popleft()
+                    elif self._stopped:
+                        break
+                with self._data_lock:
+                    fn()
+        finally:
+            # the reader may be dispatching, wait for it before returning
+            with self._data_lock:
+                self._data_cb = None
+            with self._cond:
+                self._stopped = False
+
+    def _stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _close(self):
+        if self._sock:
+            # shutdown wakes up the reader, close alone may not
+            self._sock.shutdown(socket.SHUT_RDWR)
+            self._sock.close()
+        if self._proc:
+            # nvim exits when its stdin closes, the reader then sees EOF
+            self._proc.stdin.close()
+
+    def _threadsafe_call(self, fn):
+        with self._cond:
+            self._calls.append(fn)
+            self._cond.notify_all()
+
+    def _setup_signals(self, signals):
+        if os.name == 'nt':
+            return
+        for signum in signals:
+            old = signal.signal(signum, lambda n, frame: self._on_signal(n))
+            self._signals.append((signum, old))
+
+    def _teardown_signals(self):
+        for signum, old in self._signals:
+            signal.signal(signum, old)
+        self._signals = []
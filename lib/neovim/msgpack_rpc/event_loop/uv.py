@@ -97,6 +97,12 @@ class UvEventLoop(BaseEventLoop):
     def _stop(self):
         self._loop.stop()
 
+    def _close(self):
+        self._read_stream.close()
+        if self._write_stream is not self._read_stream:
+            self._write_stream.close()
+        self._on_error('EOF')
+
     def _threadsafe_call(self, fn):
         self._callbacks.append(fn)
         self._async.send()
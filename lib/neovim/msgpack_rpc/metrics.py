@@ -0,0 +1,265 @@
+"""Counters and latency histograms for a msgpack-rpc session.
+
+An `RpcMetrics` instance can be attached to a session with
+`Session.set_metrics`. It then counts requests, responses, notifications and
+bytes in each direction, tracks how many requests are in flight, and keeps a
+round-trip latency histogram per request method.
+"""
+import threading
+import time
+
+# histogram bucket upper bounds, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# requests unanswered for this many seconds are counted as lost
+LOST_AFTER = 60.0
+
+
+def _name(name):
+    if isinstance(name, bytes):
+        return name.decode('utf-8', 'replace')
+    return str(name)
+
+
+class Histogram(object):
+
+    """Fixed-bucket latency histogram."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            i = len(BUCKETS)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """Estimate percentile `p` (0-1) as the bucket's upper bound."""
+        if not self.count:
+            return 0.0
+        target = p * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                if i < len(BUCKETS):
+                    return min(BUCKETS[i], self.max)
+                break
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0,
+            'p50_ms': self.percentile(0.5) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class RpcMetrics(object):
+
+    """Thread-safe rpc counters, updated from the session layers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.bytes_sent = 0
+            self.bytes_received = 0
+            self.messages_sent = 0
+            self.messages_received = 0
+            self.latency = {}
+            self.requests_sent = {}
+            self.notifications_sent = {}
+            self.requests_received = {}
+            self.notifications_received = {}
+            self.redraw_events = {}
+            self.errors = 0
+            self.in_flight = {}
+            self.max_in_flight = 0
+            self.lost = 0
+
+    def sent(self, nbytes):
+        with self._lock:
+            self.bytes_sent += nbytes
+            self.messages_sent += 1
+
+    def received(self, nbytes):
+        with self._lock:
+            self.bytes_received += nbytes
+
+    def request_sent(self, request_id, method):
+        method = _name(method)
+        with self._lock:
+            self.requests_sent[method] = self.requests_sent.get(method, 0) + 1
+            self.in_flight[request_id] = (method, time.time())
+            self.max_in_flight = max(self.max_in_flight, len(self.in_flight))
+            if len(self.in_flight) % 1024 == 0:
+                self._expire()
+
+    def _expire(self, older_than=LOST_AFTER):
+        # must hold self._lock
+        deadline = time.time() - older_than
+        for request_id, (_, start) in list(self.in_flight.items()):
+            if start < deadline:
+                del self.in_flight[request_id]
+                self.lost += 1
+
+    def closed(self):
+        """The connection went away, nothing in flight will be answered."""
+        with self._lock:
+            self._expire(older_than=-1)
+
+    def response_received(self, request_id, error):
+        now = time.time()
+        with self._lock:
+            self.messages_received += 1
+            pending = self.in_flight.pop(request_id, None)
+            if error:
+                self.errors += 1
+            if pending:
+                method, start = pending
+                hist = self.latency.get(method)
+                if hist is None:
+                    hist = self.latency[method] = Histogram()
+                hist.add(now - start)
+
+    def notification_sent(self, method):
+        method = _name(method)
+        with self._lock:
+            self.notifications_sent[method] = self.notifications_sent.get(method, 0) + 1
+
+    def request_received(self, method):
+        method = _name(method)
+        with self._lock:
+            self.messages_received += 1
+            self.requests_received[method] = self.requests_received.get(method, 0) + 1
+
+    def notification_received(self, method, args):
+        method = _name(method)
+        with self._lock:
+            self.messages_received += 1
+            self.notifications_received[method] = self.notifications_received.get(method, 0) + 1
+            if method == 'redraw':
+                # each redraw batch is a list of [event name, args...]
+                for event in args:
+                    if event:
+                        name = _name(event[0])
+                        self.redraw_events[name] = self.redraw_events.get(name, 0) + len(event) - 1
+
+    def snapshot(self):
+        """Return a plain dict of everything collected so far."""
+        with self._lock:
+            self._expire()
+            return {
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'messages_sent': self.messages_sent,
+                'messages_received': self.messages_received,
+                'errors': self.errors,
+                'in_flight': len(self.in_flight),
+                'max_in_flight': self.max_in_flight,
+                'lost': self.lost,
+                'latency': dict((m, h.summary()) for m, h in self.latency.items()),
+                'requests_sent': dict(self.requests_sent),
+                'notifications_sent': dict(self.notifications_sent),
+                'requests_received': dict(self.requests_received),
+                'notifications_received': dict(self.notifications_received),
+                'redraw_events': dict(self.redraw_events),
+            }
+
+    def families(self, labels=None):
+        """Metric families as (name, type, samples) tuples.
+
+        Each sample is a (suffix, extra labels, value) tuple, `labels` are
+        added to every sample.
+        """
+        base = dict(labels or {})
+
+        def sample(suffix, value, extra=None):
+            l = dict(base)
+            l.update(extra or {})
+            return (suffix, l, value)
+
+        out = []
+        with self._lock:
+            self._expire()
+            for name, value in (('bytes_sent_total', self.bytes_sent),
+                                ('bytes_received_total', self.bytes_received),
+                                ('messages_sent_total', self.messages_sent),
+                                ('messages_received_total', self.messages_received),
+                                ('errors_total', self.errors),
+                                ('lost_total', self.lost)):
+                out.append((name, 'counter', [sample('', value)]))
+            out.append(('in_flight', 'gauge', [sample('', len(self.in_flight))]))
+            for name, counts in (('requests_sent_total', self.requests_sent),
+                                 ('notifications_sent_total', self.notifications_sent),
+                                 ('requests_received_total', self.requests_received),
+                                 ('notifications_received_total', self.notifications_received)):
+                out.append((name, 'counter', [sample('', n, {'method': method})
+                                              for method, n in sorted(counts.items())]))
+            out.append(('redraw_events_total', 'counter',
+                        [sample('', n, {'event': event})
+                         for event, n in sorted(self.redraw_events.items())]))
+            samples = []
+            for method, hist in sorted(self.latency.items()):
+                seen = 0
+                for bound, n in zip(BUCKETS, hist.counts):
+                    seen += n
+                    samples.append(sample('_bucket', seen, {'method': method, 'le': repr(bound)}))
+                samples.append(sample('_bucket', hist.count, {'method': method, 'le': '+Inf'}))
+                samples.append(sample('_sum', hist.total, {'method': method}))
+                samples.append(sample('_count', hist.count, {'method': method}))
+            out.append(('latency_seconds', 'histogram', samples))
+        return out
+
+    def prometheus(self, prefix='nvim_rpc', labels=None):
+        """Render the metrics in the Prometheus text exposition format."""
+        return prometheus([(labels, self)], prefix)
+
+
+def prometheus(instances, prefix='nvim_rpc'):
+    """Render several `RpcMetrics` in one Prometheus text exposition.
+
+    `instances` is a list of (labels, metrics) pairs. Each family gets a
+    single TYPE line followed by the samples of every instance, as the format
+    doesn't allow a family to be split up.
+    """
+    def fmt(name, labels, value):
+        if labels:
+            inner = ','.join('{}="{}"'.format(k, str(v).replace('"', '\\"'))
+                             for k, v in sorted(labels.items()))
+            return '{}_{}{{{}}} {}'.format(prefix, name, inner, value)
+        return '{}_{} {}'.format(prefix, name, value)
+
+    order = []
+    kinds = {}
+    samples = {}
+    for labels, metrics in instances:
+        for name, kind, family in metrics.families(labels):
+            if name not in kinds:
+                order.append(name)
+                kinds[name] = kind
+                samples[name] = []
+            samples[name] += family
+
+    lines = []
+    for name in order:
+        lines.append('# TYPE {}_{} {}'.format(prefix, name, kinds[name]))
+        for suffix, labels, value in samples[name]:
+            lines.append(fmt(name + suffix, labels, value))
+    return lines
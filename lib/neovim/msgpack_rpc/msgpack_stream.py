@@ -1,9 +1,18 @@
 """Msgpack handling in the event loop pipeline."""
 from ActualVim.lib import msgpack
 import io
+import threading
+import time
 
 from ..compat import unicode_errors_default
 
+# recordings start with this header, followed by [seconds, direction, bytes]
+# entries for every chunk of data written (OUTBOUND) or read (INBOUND)
+RECORDING_MAGIC = 'nvim-rpc-recording'
+RECORDING_VERSION = 1
+OUTBOUND = 0
+INBOUND = 1
+
 
 class MsgpackStream(object):
 
@@ -18,14 +27,49 @@ class MsgpackStream(object):
         self._event_loop = event_loop
         self._unpacker = msgpack.Unpacker()
         self._message_cb = None
+        self._metrics = None
+        self._recording = None
+        self._recording_start = 0
+        self._recording_lock = threading.Lock()
 
     def threadsafe_call(self, fn):
         """Wrapper around `BaseEventLoop.threadsafe_call`."""
         self._event_loop.threadsafe_call(fn)
 
+    def set_metrics(self, metrics):
+        """Count bytes sent and received in `metrics`, or stop if None."""
+        self._metrics = metrics
+
+    def start_recording(self, f):
+        """Append all traffic, with timestamps, to the binary file `f`."""
+        with self._recording_lock:
+            f.write(msgpack.packb([RECORDING_MAGIC, RECORDING_VERSION,
+                                   time.time()]))
+            self._recording_start = time.time()
+            self._recording = f
+
+    def stop_recording(self):
+        """Stop recording, returns the file passed to `start_recording`."""
+        with self._recording_lock:
+            f, self._recording = self._recording, None
+            if f:
+                f.flush()
+            return f
+
+    def _record(self, direction, data):
+        with self._recording_lock:
+            if self._recording:
+                entry = [time.time() - self._recording_start, direction, data]
+                self._recording.write(msgpack.packb(entry, use_bin_type=True))
+
     def send(self, msg):
         """Queue `msg` for sending to Nvim."""
-        self._event_loop.send(msgpack.packb(msg))
+        data = msgpack.packb(msg)
+        if self._metrics:
+            self._metrics.sent(len(data))
+        if self._recording:
+            self._record(OUTBOUND, data)
+        self._event_loop.send(data)
 
     def run(self, message_cb):
         """Run the event loop to receive messages from Nvim.
@@ -41,7 +85,15 @@ class MsgpackStream(object):
         """Stop the event loop."""
         self._event_loop.stop()
 
+    def close(self):
+        """Close the underlying connection."""
+        self._event_loop.close()
+
     def _on_data(self, data):
+        if self._metrics:
+            self._metrics.received(len(data))
+        if self._recording:
+            self._record(INBOUND, data)
         self._unpacker.feed(data)
         for msg in self._unpacker:
             self._message_cb(msg)
@@ -4,6 +4,78 @@ from queue import Queue
 import threading
 import traceback
 
+
+class Dispatcher(object):
+
+    """Runs jobs in order per key, with different keys running concurrently.
+
+    Each key has its own FIFO queue, and at most one job per key runs at a
+    time. Ready keys are picked up by a small pool of worker threads, which
+    is grown on demand up to `max_workers`.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._ready = deque()
+        self._busy = set()
+        self._workers = 0
+        self._idle = 0
+
+    def dispatch(self, key, fn, args=(), kwargs={}):
+        """Queue `fn(*args, **kwargs)` behind earlier jobs with the same key."""
+        with self._cond:
+            q = self._queues.get(key)
+            if q is None:
+                q = self._queues[key] = deque()
+            q.append((fn, args, kwargs))
+            if len(q) == 1 and key not in self._busy:
+                self._ready.append(key)
+                # idle workers that were already notified still count as idle
+                # until they wake, so compare against everything ready
+                if len(self._ready) > self._idle and self._workers < self.max_workers:
+                    self._workers += 1
+                    thread = threading.Thread(target=self._worker)
+                    thread.daemon = True
+                    thread.start()
+                else:
+                    self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                key = self._ready.popleft()
+                self._busy.add(key)
+                cb, args, kwargs = self._queues[key].popleft()
+            try:
+                cb(*args, **kwargs)
+            except Exception:
+                traceback.print_exc()
+            with self._cond:
+                self._busy.discard(key)
+                if self._queues[key]:
+                    self._ready.append(key)
+                else:
+                    del self._queues[key]
+
+
+class ConcurrentKey(object):
+
+    """Dispatch key for a job that may run alongside any other job.
+
+    Each instance is a key of its own. Jobs keyed this way run on a separate
+    worker pool, so however many are in flight they can't hold up the
+    ordered queues.
+    """
+
+    __slots__ = ()
+
+
 class Session(object):
 
     """Msgpack-rpc session layer that uses coroutines for a synchronous API.
@@ -17,29 +89,39 @@ class Session(object):
         """Wrap `async_session` on a synchronous msgpack-rpc interface."""
         self._async_session = async_session
         self._request_cb = self._notification_cb = None
+        self._dispatch_key = None
         self._pending_messages = deque()
         self._is_running = False
         self._setup_exception = None
         self._lock = threading.RLock()
 
-        self._async_queue = Queue()
-        thread = threading.Thread(target=self._async_worker)
-        thread.daemon = True
-        thread.start()
-
-    def _async_worker(self):
-        while True:
-            job = self._async_queue.get()
-            if job is None:
-                return
-            cb, args, kwargs = job
-            try:
-                cb(*args, **kwargs)
-            except Exception:
-                traceback.print_exc()
+        self._dispatcher = Dispatcher()
+        self._concurrent_dispatcher = Dispatcher()
 
     def async_dispatch(self, fn, *args, **kwargs):
-        self._async_queue.put((fn, args, kwargs))
+        """Run `fn` on a worker, in order with other unkeyed jobs."""
+        self._dispatcher.dispatch(None, fn, args, kwargs)
+
+    def keyed_dispatch(self, key, fn, *args, **kwargs):
+        """Run `fn` on a worker, in order with other jobs for `key`.
+
+        Jobs for different keys may run concurrently. A key of None is the
+        shared global queue used by `async_dispatch`. `ConcurrentKey` jobs
+        run on their own worker pool.
+        """
+        if isinstance(key, ConcurrentKey):
+            self._concurrent_dispatcher.dispatch(key, fn, args, kwargs)
+        else:
+            self._dispatcher.dispatch(key, fn, args, kwargs)
+
+    def _message_key(self, name, args):
+        if self._dispatch_key is None:
+            return None
+        try:
+            return self._dispatch_key(name, args)
+        except Exception:
+            traceback.print_exc()
+            return None
 
     def threadsafe_call(self, fn, *args, **kwargs):
         """Wrapper around `AsyncSession.threadsafe_call`."""
@@ -47,6 +129,18 @@ class Session(object):
             self.async_dispatch(fn, *args, **kwargs)
         self._async_session.threadsafe_call(async_wrapper)
 
+    def set_metrics(self, metrics):
+        """Record rpc traffic to a `RpcMetrics` instance, or stop if None."""
+        self._async_session.set_metrics(metrics)
+
+    def start_recording(self, f):
+        """Record all rpc traffic to the binary file `f`."""
+        self._async_session.start_recording(f)
+
+    def stop_recording(self):
+        """Stop recording, returns the file that was being written."""
+        return self._async_session.stop_recording()
+
     def next_message(self):
         """Block until a message(request or notification) is available.
 
@@ -112,14 +206,20 @@ class Session(object):
                 raise self.error_wrapper(err)
             return rv
 
-    def run(self, request_cb, notification_cb, setup_cb=None):
+    def run(self, request_cb, notification_cb, setup_cb=None,
+            dispatch_key=None):
         """Run the event loop to receive requests and notifications from Nvim.
 
         Like `AsyncSession.run()`, but `request_cb` and `notification_cb` are
         inside greenlets.
+
+        If `dispatch_key(name, args)` is passed, messages are handled in
+        order per returned key, and messages with different keys may be
+        handled concurrently. Messages keyed None share one ordered queue.
         """
         self._request_cb = request_cb
         self._notification_cb = notification_cb
+        self._dispatch_key = dispatch_key
         self._is_running = True
         self._setup_exception = None
 
@@ -145,6 +245,7 @@ class Session(object):
         self._is_running = False
         self._request_cb = None
         self._notification_cb = None
+        self._dispatch_key = None
 
         if self._setup_exception:
             raise self._setup_exception
@@ -153,6 +254,10 @@ class Session(object):
         """Stop the event loop."""
         self._async_session.stop()
 
+    def close(self):
+        """Close the connection to Nvim."""
+        self._async_session.close()
+
     def _yielding_request(self, method, args, timeout=None):
         q = Queue()
 
@@ -199,7 +304,7 @@ class Session(object):
             except Exception as err:
                 response.send(repr(err) + "\n" + traceback.format_exc(5), error=True)
 
-        self.async_dispatch(handler)
+        self.keyed_dispatch(self._message_key(name, args), handler)
 
     def _on_notification(self, name, args):
         def handler():
@@ -208,7 +313,7 @@ class Session(object):
             except Exception:
                 pass
 
-        self.async_dispatch(handler)
+        self.keyed_dispatch(self._message_key(name, args), handler)
 
 
 class ErrorResponse(BaseException):
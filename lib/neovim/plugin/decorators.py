@@ -5,7 +5,7 @@ import inspect
 from ..compat import IS_PYTHON3, unicode_errors_default
 
 __all__ = ('plugin', 'rpc_export', 'command', 'autocmd', 'function',
-           'encoding', 'decode', 'shutdown_hook')
+           'encoding', 'decode', 'shutdown_hook', 'concurrent')
 
 
 def plugin(cls):
@@ -138,6 +138,18 @@ def shutdown_hook(f):
     return f
 
 
+def concurrent(f):
+    """Tag a handler as safe to run concurrently with other handlers.
+
+    Calls to concurrent handlers run on a separate worker pool as they
+    arrive, so a slow call doesn't hold up other handlers, and responses may
+    be sent out of order. Untagged handlers keep running one at a time, in
+    the order Nvim sent them.
+    """
+    f._nvim_concurrent = True
+    return f
+
+
 def decode(mode=unicode_errors_default):
     """Configure automatic encoding/decoding of strings."""
     def dec(f):
@@ -5,13 +5,15 @@ import inspect
 import os
 import os.path
 import re
+import threading
+import time
 
 from traceback import format_exc
 
 from . import script_host
 from ..api import decode_if_bytes, walk
 from ..compat import IS_PYTHON3, find_module
-from ..msgpack_rpc import ErrorResponse
+from ..msgpack_rpc import ConcurrentKey, ErrorResponse
 from ..util import format_exc_skip
 
 __all__ = ('Host')
@@ -35,8 +37,13 @@ class Host(object):
         self._request_handlers = {
             'poll': lambda: 'ok',
             'specs': self._on_specs_request,
+            'stats': self._on_stats_request,
             'shutdown': self.shutdown
         }
+        # rpc method names of handlers tagged with @concurrent
+        self._concurrent = set()
+        self._timings = {}
+        self._timings_lock = threading.Lock()
 
         # Decode per default for Python3
         self._decode_default = IS_PYTHON3
@@ -49,18 +56,38 @@ class Host(object):
         self.nvim.run_loop(self._on_request,
                            self._on_notification,
                            lambda: self._load(plugins),
-                           err_cb=self._on_async_err)
+                           err_cb=self._on_async_err,
+                           dispatch_key=self._dispatch_key)
 
     def shutdown(self):
         """Shutdown the host."""
         self._unload()
         self.nvim.stop_loop()
 
+    def _dispatch_key(self, name, arg):
+        if IS_PYTHON3:
+            name = decode_if_bytes(name)
+        if name in self._concurrent:
+            # a key of its own on a separate pool, so the call doesn't wait on
+            # anything and ordered handlers don't wait on it
+            return ConcurrentKey()
+        return None
+
+    def _record_timing(self, name, seconds):
+        with self._timings_lock:
+            stats = self._timings.get(name)
+            if stats is None:
+                stats = self._timings[name] = {'calls': 0, 'total': 0, 'max': 0}
+            stats['calls'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+
     def _wrap_function(self, fn, sync, decode, nvim_bind, name, *args):
         if decode:
             args = walk(decode_if_bytes, args, decode)
         if nvim_bind is not None:
             args.insert(0, nvim_bind)
+        start = time.time()
         try:
             return fn(*args)
         except Exception:
@@ -72,6 +99,8 @@ class Host(object):
                 msg = ("error caught in async handler '{} {}'\n{}\n"
                        .format(name, args, format_exc_skip(1)))
                 self._on_async_err(msg + "\n")
+        finally:
+            self._record_timing(name, time.time() - start)
 
     def _on_request(self, name, args):
         """Handle a msgpack-rpc request."""
@@ -145,6 +174,7 @@ class Host(object):
                     del self._request_handlers[method_name]
                 else:
                     del self._notification_handlers[method_name]
+                self._concurrent.discard(method_name)
         self._specs = {}
         self._loaded = {}
 
@@ -187,6 +217,8 @@ class Host(object):
                     raise Exception(('Notification handler for "{}" is ' +
                                     'already registered').format(method))
                 self._notification_handlers[method] = fn_wrapped
+            if getattr(fn, '_nvim_concurrent', False):
+                self._concurrent.add(method)
             if hasattr(fn, '_nvim_rpc_spec'):
                 specs.append(fn._nvim_rpc_spec)
             handlers.append(fn_wrapped)
@@ -206,6 +238,16 @@ class Host(object):
             self.nvim.out_write(self._load_errors[path] + '\n')
         return self._specs.get(path, 0)
 
+    def _on_stats_request(self):
+        """Return call count and timings (in ms) for each plugin handler."""
+        with self._timings_lock:
+            return dict((name, {
+                'calls': t['calls'],
+                'total_ms': t['total'] * 1000,
+                'mean_ms': t['total'] / t['calls'] * 1000,
+                'max_ms': t['max'] * 1000,
+            }) for name, t in self._timings.items())
+
     def _configure_nvim_for(self, obj):
         # Configure a nvim instance for obj (checks encoding configuration)
         nvim = self.nvim
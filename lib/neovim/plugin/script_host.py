@@ -3,6 +3,7 @@ import imp
 import io
 import os
 import sys
+import threading
 
 from .decorators import plugin, rpc_export
 from ..api import Nvim, walk
@@ -95,29 +96,37 @@ class ScriptHost(object):
         exec(function_def, self.module.__dict__)
         # get the function
         function = self.module.__dict__[fname]
+        buf = nvim.current.buffer
+        # Process batches of 5000 to avoid the overhead of making multiple
+        # API calls for every line. Assuming an average line length of 100
+        # bytes, approximately 488 kilobytes will be transferred per batch,
+        # which can be done very quickly in a single API call. The next batch
+        # is fetched while the current one runs, and pydo never changes the
+        # line count, so the prefetched range stays valid.
+        pending = _prefetch_lines(buf, start, min(start + 5000, stop))
         while start < stop:
-            # Process batches of 5000 to avoid the overhead of making multiple
-            # API calls for every line. Assuming an average line length of 100
-            # bytes, approximately 488 kilobytes will be transferred per batch,
-            # which can be done very quickly in a single API call.
             sstart = start
             sstop = min(start + 5000, stop)
-            lines = nvim.current.buffer.api.get_lines(sstart, sstop, True)
+            lines = pending()
+            if sstop < stop:
+                pending = _prefetch_lines(buf, sstop, min(sstop + 5000, stop))
 
             exception = None
+            calls = []
             newlines = []
             linenr = sstart + 1
             for i, line in enumerate(lines):
                 result = function(line, linenr)
                 if result is None:
-                    # Update earlier lines, and skip to the next
+                    # Queue an update for earlier lines, and skip to the next
                     if newlines:
-                        end = sstart + len(newlines) - 1
-                        nvim.current.buffer.api.set_lines(sstart, end,
-                                                          True, newlines)
+                        # end is exclusive (it used to be one short, which
+                        # inserted the new lines instead of replacing them)
+                        end = sstart + len(newlines)
+                        calls.append(('nvim_buf_set_lines',
+                                      [buf, sstart, end, True, newlines]))
                     sstart += len(newlines) + 1
                     newlines = []
-                    pass
                 elif isinstance(result, basestring):
                     newlines.append(result)
                 else:
@@ -130,7 +139,13 @@ class ScriptHost(object):
             start = sstop
             if newlines:
                 end = sstart + len(newlines)
-                nvim.current.buffer.api.set_lines(sstart, end, True, newlines)
+                calls.append(('nvim_buf_set_lines',
+                              [buf, sstart, end, True, newlines]))
+            # every write for the batch goes out in a single round trip
+            if calls:
+                results, error = nvim.request('nvim_call_atomic', calls)
+                if error:
+                    raise nvim.error(error[2])
             if exception:
                 raise exception
         # delete the function
@@ -170,6 +185,32 @@ def num_to_str(obj):
         return obj
 
 
+def _prefetch_lines(buf, start, stop):
+    """Fetch buffer lines on a helper thread, returns a function to wait.
+
+    The host's session already runs the event loop, so a request from another
+    thread is answered while this one keeps working.
+    """
+    result = {}
+
+    def fetch():
+        try:
+            result['lines'] = buf.api.get_lines(start, stop, True)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=fetch)
+    thread.daemon = True
+    thread.start()
+
+    def wait():
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return result['lines']
+    return wait
+
+
 class LegacyVim(Nvim):
     def eval(self, expr):
         obj = self.request("vim_eval", expr)
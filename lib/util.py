@@ -1,10 +1,25 @@
+import json
 import os
 import shutil
 import string
 import tempfile
+import threading
 from threading import Timer
 import subprocess
 
+# login shell startup files, any change to these invalidates the cached PATH
+RC_FILES = (
+    '/etc/profile', '/etc/paths', '/etc/zshenv', '/etc/zprofile', '/etc/zshrc',
+    '~/.profile', '~/.bash_profile', '~/.bash_login', '~/.bashrc',
+    '~/.zshenv', '~/.zprofile', '~/.zshrc', '~/.zlogin',
+    '~/.config/fish/config.fish',
+)
+
+# disk cache for find_path() and which() results, see set_path_cache()
+_path_cache = None
+_path_cache_extra = ''
+_path_cache_lock = threading.Lock()
+
 def memoize(f):
     rets = {}
 
@@ -66,10 +81,74 @@ def find_path(env):
 
     return p
 
+def set_path_cache(path, extra=''):
+    # extra is mixed into the cache key, for settings that change what we look up
+    global _path_cache, _path_cache_extra
+    _path_cache = path
+    _path_cache_extra = extra
+
+def path_cache_key(env):
+    mtimes = []
+    for name in RC_FILES:
+        try:
+            mtimes.append([name, os.path.getmtime(os.path.expanduser(name))])
+        except OSError:
+            pass
+    return [env.get('SHELL', ''), _path_cache_extra, mtimes]
+
+def load_path_cache():
+    try:
+        with open(_path_cache, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return data
+    except (OSError, ValueError):
+        pass
+    return {}
+
+def save_path_cache(data):
+    try:
+        os.makedirs(os.path.dirname(_path_cache), exist_ok=True)
+        tmp = _path_cache + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, _path_cache)
+    except OSError as e:
+        print('Error writing PATH cache:', e)
+
+def refresh_path(env, key):
+    path = find_path(env)
+    with _path_cache_lock:
+        data = load_path_cache()
+        if data.get('key') != key:
+            return
+        if path != data.get('PATH'):
+            os.environ['PATH'] = path
+            data['PATH'] = path
+            data['which'] = {cmd: which(cmd) for cmd in data.get('which', {})}
+            save_path_cache(data)
+
+def cached_path(env):
+    # only the first discovery for a given shell setup blocks, later ones refresh in the background
+    if _path_cache is None:
+        return find_path(env)
+
+    key = path_cache_key(env)
+    with _path_cache_lock:
+        data = load_path_cache()
+        if data.get('key') == key and data.get('PATH'):
+            threading.Thread(target=refresh_path, args=(dict(env), key), daemon=True).start()
+            return data['PATH']
+
+    path = find_path(env)
+    with _path_cache_lock:
+        save_path_cache({'key': key, 'PATH': path, 'which': {}})
+    return path
+
 @memoize
 def create_environment():
     if os.name == 'posix':
-        os.environ['PATH'] = find_path(os.environ)
+        os.environ['PATH'] = cached_path(os.environ)
 
     return os.environ
 
@@ -88,6 +167,26 @@ def which(cmd):
 
     return None
 
+def cached_which(cmd):
+    env = create_environment()
+    if _path_cache is None:
+        return which(cmd)
+
+    key = path_cache_key(env)
+    with _path_cache_lock:
+        data = load_path_cache()
+        path = data.get('which', {}).get(cmd)
+        if data.get('key') == key and path and can_exec(path):
+            return path
+
+    path = which(cmd)
+    with _path_cache_lock:
+        data = load_path_cache()
+        if data.get('key') == key:
+            data.setdefault('which', {})[cmd] = path
+            save_path_cache(data)
+    return path
+
 def touch(path):
     with open(path, 'a'):
         os.utime(path, None)
@@ -0,0 +1,90 @@
+# metrics.py
+# serves rpc metrics in Prometheus text format over a local unix socket, for dashboards
+# try it with: curl --unix-socket <rpc_metrics_socket> http://localhost/metrics
+
+import os
+import socket
+import threading
+import traceback
+
+
+class MetricsServer:
+    def __init__(self, path, collect):
+        # collect() returns a list of Prometheus text lines
+        self.path = path
+        self.collect = collect
+        self.sock = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # create the socket private, instead of fixing it up after anyone could have connected
+        umask = os.umask(0o177)
+        try:
+            self.sock.bind(self.path)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+        self.sock.listen(4)
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def stop(self):
+        sock, self.sock = self.sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def _accept(self):
+        while self.sock:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            # answer anything that looks like (or isn't) an http request with the metrics
+            conn.settimeout(1)
+            try:
+                conn.recv(4096)
+            except socket.timeout:
+                pass
+            body = ('\n'.join(self.collect()) + '\n').encode('utf8')
+            header = 'HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: {}\r\n\r\n'
+            conn.sendall(header.format(len(body)).encode('utf8') + body)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            conn.close()
+
+if not 'server' in globals():
+    server = None
+
+def start(path, collect):
+    global server
+    stop()
+    if os.name == 'nt':
+        print('ActualVim: rpc_metrics_socket needs unix sockets, ignoring it on Windows')
+        return
+    try:
+        server = MetricsServer(path, collect)
+        server.start()
+        print('ActualVim: serving rpc metrics at', path)
+    except OSError as e:
+        print('ActualVim: could not serve rpc metrics at {}: {}'.format(path, e))
+        server = None
+
+def stop():
+    global server
+    if server:
+        server.stop()
+        server = None
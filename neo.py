@@ -1,21 +1,42 @@
 import contextlib
 import os
 import queue
+import signal
+import stat
+import subprocess
 import sublime
 import sys
+import tempfile
 import threading
 import time
 import traceback
+import uuid
 
+# the event loop backend and plugin host are imported on demand, see Vim._setup
+import_start = time.time()
 from .lib import neovim
+IMPORT_MS = (time.time() - import_start) * 1000
 from .lib import util
+from . import metrics
 from . import settings
+from .keytrace import tracer
 from .screen import Screen
 
 # os.environ['NVIM_LOG_FILE'] = '/Users/aegis/.nvimlog'
 
 if not '_loaded' in globals():
     NEOVIM_PATH = None
+    vim = None
+    pool = None
+    start_lock = threading.Lock()
+    start_failed = False
+    # a warm, fully set up nvim kept around for crash recovery and plugin reloads
+    standby = None
+    standby_lock = threading.Lock()
+    # tags our buffers in a persistent server, Sublime reuses view ids in its next session
+    session = uuid.uuid4().hex
+    # bumped by every plugin_loaded, tells plugin_unloaded whether it was a reload
+    generation = 0
     _loaded = False
     _loading = False
 
@@ -35,13 +56,32 @@ MODES = {
     # TODO: select, vreplace?
 }
 
+# readiness states
+READY = 'ready'
+# input was sent and we don't know the outcome yet
+BUSY = 'busy'
+# nvim is waiting on more input (operator pending, cmdline, prompts)
+BLOCKED = 'blocked'
+# ui mode_change names that mean nvim is blocked on input
+BLOCKING_UI_MODES = ('operator', 'cmdline_normal', 'cmdline_insert', 'cmdline_replace')
+# seconds until a BUSY or BLOCKED state is treated as stale and nvim is asked again
+READY_EXPIRY = 1.0
+
+# messages from nvim that belong to a single view, see Vim._event_loop
+BUFFER_EVENTS = ('nvim_buf_lines_event', 'nvim_buf_changedtick_event')
+VIEW_EVENTS = ('appcmd', 'wincmd', 'textcmd')
+VIEW_REQUESTS = ('write', 'read', 'enter', 'complete')
+
 def plugin_loaded():
-    global NEOVIM_PATH
+    global NEOVIM_PATH, generation
+    generation += 1
     settings.load()
 
     NEOVIM_PATH = sublime.load_settings('ActualVim.sublime-settings').get('neovim_path')
+    # the login shell PATH lookup is slow, so it's cached on disk and refreshed in the background
+    util.set_path_cache(os.path.join(sublime.cache_path(), 'ActualVim', 'env.json'), NEOVIM_PATH or '')
     if not NEOVIM_PATH:
-        NEOVIM_PATH = util.which('nvim')
+        NEOVIM_PATH = util.cached_which('nvim')
 
     if sys.platform == 'win32':
         if not NEOVIM_PATH:
@@ -70,70 +110,424 @@ def plugin_loaded():
     if not NEOVIM_PATH:
         raise Exception('cannot find nvim executable')
     print('ActualVim: using nvim binary path:', NEOVIM_PATH)
+    print('ActualVim: neovim client imported in {:.2f}ms'.format(IMPORT_MS))
+
+    socket_path = settings.get('rpc_metrics_socket')
+    if socket_path:
+        metrics.start(os.path.expanduser(socket_path), prometheus_metrics)
+
+    global start_failed
+    start_failed = False
+    # nvim starts in the background, on first activation unless lazy_start is off
+    # keys pressed before it's ready are queued by their view
+    if not settings.get('lazy_start', True):
+        start()
+
+def start():
+    global _loading
+    with start_lock:
+        if _loaded or _loading or start_failed:
+            return
+        _loading = True
+    threading.Thread(target=_start, daemon=True).start()
 
-    global vim, _loaded, _loading
+def _start():
+    global vim, pool, _loaded, _loading, start_failed
     try:
         start = time.time()
-        vim = Vim()
-        _loading = True
-        vim._setup()
-
+        if persistent():
+            vim = spawn_server()
+        else:
+            vim = spawn()
+        pool = VimPool(vim)
         _loaded = True
-        _loading = False
-        from .view import neovim_loaded
-        neovim_loaded()
-        print('ActualVim: nvim started in {:.2f}ms'.format((time.time() - start) * 1000))
     except Exception:
         print('ActualVim: Error during nvim setup.')
         traceback.print_exc()
         _loaded = False
-        _loading = False
+        start_failed = True
         vim = None
-        del vim
+        pool = None
+        return
+    finally:
+        _loading = False
+
+    phases = ', '.join('{} {:.2f}ms'.format(name, ms) for name, ms in vim.phases)
+    print('ActualVim: nvim started in {:.2f}ms ({})'.format((time.time() - start) * 1000, phases or 'standby'))
+    from .view import neovim_loaded
+    sublime.set_timeout(neovim_loaded, 0)
+    start_standby()
 
 def plugin_unloaded():
     from .view import neovim_unloaded
     neovim_unloaded()
+    metrics.stop()
 
-    global vim, _loaded
+    # the standby (and a persistent server) is left running,
+    # so a plugin reload can adopt it instead of waiting on a new nvim
+    global vim, pool, _loaded
     if _loaded:
-        vim.nv.command('qa!', async=True)
+        pool.quit()
         vim = None
+        pool = None
         _loaded = False
 
+    # a reload loads us again right away, otherwise the package was disabled or removed
+    unloaded = generation
+    def quit_standby():
+        global standby
+        if generation != unloaded:
+            return
+        with standby_lock:
+            v, standby = standby, None
+        if v is not None:
+            v.quit()
+    sublime.set_timeout(quit_standby, 5000)
+
+def spawn():
+    global standby
+    with standby_lock:
+        v, standby = standby, None
+    if v is not None and not getattr(v, 'exited', False):
+        # might be from before a plugin reload
+        v.__class__ = Vim
+        # already set up, no startup phases to report
+        v.phases = []
+        return v
+    v = Vim()
+    v._setup()
+    return v
+
+def persistent():
+    return bool(settings.get('persistent_server')) and os.name != 'nt'
+
+def spawn_server(reattach=True):
+    # a fresh server instead of the running one when reattach is off (restarts)
+    v = Vim(persistent=True)
+    v._setup(reattach=reattach)
+    return v
+
+def start_standby():
+    if not settings.get('standby', False):
+        return
+
+    def run():
+        global standby
+        try:
+            v = Vim()
+            v._setup()
+        except Exception:
+            print('ActualVim: Error starting standby nvim.')
+            traceback.print_exc()
+            return
+        with standby_lock:
+            if standby is None or standby.exited:
+                standby = v
+                return
+        v.quit()
+
+    with standby_lock:
+        if standby is not None and not standby.exited:
+            return
+    threading.Thread(target=run, daemon=True).start()
+
+def replace(old):
+    # swap a dead or hung nvim for the standby, views rebuild their buffers as they're activated
+    # a new nvim can take seconds to come up, so it's started off the main thread
+    if not _loaded:
+        return
+    threading.Thread(target=_replace, args=(old,), daemon=True).start()
+
+def _replace(old):
+    try:
+        start = time.time()
+        if old.persistent:
+            # the standby and embedded nvims don't outlive a reload, stay on a server
+            # a server still on its way out could take the new server's socket with it
+            deadline = time.time() + 2
+            while not old.exited and time.time() < deadline:
+                time.sleep(0.01)
+            if not old.exited:
+                old.kill()
+            new = spawn_server(reattach=False)
+        else:
+            new = spawn()
+    except Exception:
+        print('ActualVim: Error replacing nvim.')
+        traceback.print_exc()
+        return
+
+    def swap():
+        global vim
+        if not _loaded:
+            # unloaded while we were starting it
+            if new.persistent:
+                new.detach()
+            else:
+                new.quit()
+            return
+        pool.replace(old, new)
+        if vim is old:
+            vim = new
+        from .view import neovim_replaced
+        neovim_replaced(old, new)
+        print('ActualVim: nvim replaced in {:.2f}ms'.format((time.time() - start) * 1000))
+        start_standby()
+    sublime.set_timeout(swap, 0)
+
+def restart(old):
+    old.quit()
+    replace(old)
+
+def rpc_metrics():
+    # (label, RpcMetrics) for each running nvim, the standby isn't included
+    if not pool:
+        return []
+    return [(label, v.metrics) for label, v in pool.labeled() if getattr(v, 'metrics', None)]
+
+def prometheus_metrics():
+    return neovim.msgpack_rpc.metrics.prometheus([({'instance': label}, m) for label, m in rpc_metrics()])
+
+def rpc_backend():
+    if settings.get('rpc_transport', 'default') == 'pipe':
+        return 'pipe'
+    return None
+
+def server_path():
+    # private per-user directory, so other users can't drive our nvim (or plant a server for us to talk to)
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime and os.path.isdir(runtime):
+        base = os.path.join(runtime, 'actualvim')
+    else:
+        base = os.path.join(tempfile.gettempdir(), 'actualvim-{}'.format(os.getuid()))
+    try:
+        os.mkdir(base, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(base)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) != 0o700:
+        raise Exception('refusing nvim server directory {}: must be a directory owned by us with mode 0700'.format(base))
+    return os.path.join(base, 'nvim.sock')
+
+def start_server(path, args, timeout=5):
+    if os.path.exists(path):
+        os.unlink(path)
+    subprocess.Popen([NEOVIM_PATH, '--headless', '--listen', path, '-n'] + args,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True)
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if time.time() > deadline:
+            raise Exception('nvim server did not create socket at {}'.format(path))
+        time.sleep(0.01)
+
+def vim_exited(v):
+    global standby
+    with standby_lock:
+        if standby is v:
+            standby = None
+            return
+    if v.quitting or not _loaded:
+        return
+    print('ActualVim: nvim exited unexpectedly, recovering')
+    replace(v)
+
+
+# shards views across embedded nvim instances, according to the "nvim_pool" setting:
+#     single:      every view shares one nvim (default)
+#     window:      one nvim per Sublime window
+#     project:     one nvim per project (or window, if there's no project)
+#     round_robin: views are spread across "size" instances
+# the first instance (neo.vim) serves the first shard, others are spawned in the background on demand
+# and quit once their last view closes
+class VimPool:
+    def __init__(self, primary):
+        self.lock = threading.RLock()
+        self.primary = primary
+        self.instances = {}
+        self.next_rr = 0
+        # keys with an nvim starting in the background, and the key each waiting view was given
+        self.spawning = set()
+        self.waiting = {}
+
+    @property
+    def config(self):
+        return settings.get('nvim_pool', {})
+
+    def key(self, view):
+        mode = self.config.get('mode', 'single')
+        if mode == 'round_robin':
+            key = self.waiting.get(view.id())
+            if key is not None:
+                return key
+            size = max(1, int(self.config.get('size', 2)))
+            key = self.next_rr % size
+            self.next_rr += 1
+            return ('round_robin', key)
+
+        window = view.window()
+        if not window:
+            return None
+        if mode == 'window':
+            return ('window', window.id())
+        elif mode == 'project':
+            folders = window.folders()
+            project = window.project_file_name() or (folders and folders[0])
+            return ('project', project or window.id())
+        return None
+
+    def get(self, view):
+        # returns None while the view's nvim is starting in the background, see _spawn
+        with self.lock:
+            key = self.key(view)
+            if key is None:
+                return self.primary
+            vim = self.instances.get(key)
+            if vim is None:
+                if self.primary not in self.instances.values():
+                    vim = self.primary
+                    self.instances[key] = vim
+                else:
+                    # the view asks again once the instance is up, it has to get the same key
+                    self.waiting[view.id()] = key
+                    if key not in self.spawning:
+                        self.spawning.add(key)
+                        threading.Thread(target=self._spawn, args=(key,), daemon=True).start()
+                    return None
+            self.waiting.pop(view.id(), None)
+            return vim
+
+    def _spawn(self, key):
+        try:
+            start = time.time()
+            vim = spawn()
+            print('ActualVim: nvim for {} started in {:.2f}ms'.format(key, (time.time() - start) * 1000))
+            start_standby()
+        except Exception:
+            print('ActualVim: Error starting pooled nvim for {}, using primary.'.format(key))
+            traceback.print_exc()
+            vim = self.primary
+        with self.lock:
+            self.spawning.discard(key)
+            self.instances[key] = vim
+        from .view import neovim_pooled
+        sublime.set_timeout(neovim_pooled, 0)
+
+    def release(self, vim):
+        # stop pooled instances once their last view closes (the primary stays up)
+        with self.lock:
+            if vim is self.primary or vim.views:
+                return
+            for key, other in list(self.instances.items()):
+                if other is vim:
+                    del self.instances[key]
+            vim.quit()
+
+    def replace(self, old, new):
+        with self.lock:
+            if self.primary is old:
+                self.primary = new
+            for key, other in list(self.instances.items()):
+                if other is old:
+                    self.instances[key] = new
+
+    def labeled(self):
+        with self.lock:
+            out = [('primary', self.primary)]
+            for key, vim in self.instances.items():
+                if vim is not self.primary:
+                    out.append(('{}:{}'.format(*key), vim))
+            return out
+
+    def quit(self):
+        with self.lock:
+            instances = set(self.instances.values())
+            instances.add(self.primary)
+            for vim in instances:
+                if vim.persistent:
+                    vim.detach()
+                else:
+                    vim.quit()
+            self.instances = {}
+
 
 class Vim:
-    def __init__(self, nv=None):
+    def __init__(self, nv=None, persistent=False):
         self.nv = nv
-        self.ready = threading.Lock()
+        # persistent instances are a --listen server that outlives plugin reloads
+        self.persistent = persistent
+        # buffers left in a persistent server by a previous load, by Sublime view id
+        self.orphans = {}
+        # attached to a server that was already running
+        self.reattached = False
+        # process id of a persistent server, so a hung one can be killed
+        self.pid = None
+        self.quitting = False
+        self.exited = False
+        # path of the rpc recording in progress, if any
+        self.recording = None
+        self.ready_cond = threading.Condition()
+        self.ready_state = READY
+        self.ready_changed = time.time()
 
         self.status_lock = threading.Lock()
         self.status_last = {}
         self.status_dirty = True
 
         self.av = None
+        # for redraws with no view to lock, see view_lock
+        self.event_lock = threading.RLock()
         self.width = 80
         self.height = 24
 
-    def _setup(self):
+    @classmethod
+    def headless(cls):
+        # a Vim with no nvim behind it, for feeding recorded traffic through on_notification (see replay.py)
+        v = cls()
+        v.screen = Screen()
+        v.views = {}
+        return v
+
+    def start_recording(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.nv.start_recording(open(path, 'wb'))
+        self.recording = path
+
+    def stop_recording(self):
+        path, self.recording = self.recording, None
+        f = self.nv.stop_recording()
+        if f:
+            f.close()
+        return path
+
+    def _phase(self, name):
+        now = time.time()
+        self.phases.append((name, (now - self.phase_start) * 1000))
+        self.phase_start = now
+
+    def _setup(self, reattach=True):
         self.screen = Screen()
         self.views = {}
+        self.phases = []
+        self.phase_start = time.time()
 
         args = settings.get('neovim_args') or []
         if not isinstance(args, list):
             print('ActualVim: ignoring non-list ({}) args: {}'.format(type(args), repr(args)))
             args = []
-        self.nv = neovim.attach('child', argv=[NEOVIM_PATH, '--embed', '-n'] + args)
+        # first use pays for importing the transport (asyncio unless pyuv is around)
+        neovim.msgpack_rpc.event_loop.load_backend(rpc_backend())
+        self._phase('import')
+        if self.persistent:
+            self.nv = self._attach_server(args, reattach)
+        else:
+            self.nv = neovim.attach('child', argv=[NEOVIM_PATH, '--embed', '-n'] + args, backend=rpc_backend())
+        self._phase('spawn')
 
-        # toss in <FocusGained> in case there's a blocking prompt on startup (like vimrc errors)
-        self.nv.input('<FocusGained>')
-        messages = self.nv.eval('execute("messages")').strip()
-        if messages:
-            print('ActualVim: nvim startup error:')
-            print('-'*20)
-            print(messages)
-            print('-'*20)
-            sublime.active_window().run_command('show_panel', {'panel': 'console'})
+        self.metrics = None
+        if settings.get('rpc_metrics', False):
+            self.metrics = neovim.msgpack_rpc.RpcMetrics()
+            self.nv.set_metrics(self.metrics)
 
         self._sem = threading.Semaphore(0)
         self._thread = t = threading.Thread(target=self._event_loop)
@@ -141,92 +535,178 @@ class Vim:
         t.start()
 
         self._sem.acquire()
+        self._phase('event loop')
 
-        # set up UI (before anything else so we can see errors)
         options = {
             'ext_popupmenu': True,
             'ext_cmdline': True,
             'rgb': True,
         }
-        self.nv.ui_attach(self.width, self.height, options)
-
-        # hidden buffers allow us to multiplex them
-        self.nv.options['hidden'] = True
-
-        # folds aren't implemented
-        self.cmd('set nofoldenable')
 
         rpc_id = self.nv.channel_id
-        # set up buffer read/write commands
-        cmd = 'autocmd {{}} * :call rpcrequest({}, "{{}}", expand("<abuf>"), expand("<afile>"))'.format(rpc_id)
-        # self.cmd(cmd.format('BufWritePre', 'write_pre'))
-        self.cmd(cmd.format('BufReadCmd', 'read'))
-        self.cmd(cmd.format('BufWriteCmd', 'write'))
-        self.cmd(cmd.format('BufEnter', 'enter'))
+        # buffer read/write commands
+        # in a group, so reattaching to a persistent server replaces the old channel's autocmds
+        autocmd = 'autocmd ActualVim {{}} * :call rpcrequest({}, "{{}}", expand("<abuf>"), expand("<afile>"))'.format(rpc_id)
 
         def funcdef(prototype, body):
-            self.eval(r'''execute(":function! {} \n {} \n endfunction")'''.format(prototype, body))
-
-        # set up autocomplete from Sublime via completefunc (ctrl-x, ctrl-u)
-        # controlled via bufopts['completefunc'] in ActualVim settings
-        complete = r'''return rpcrequest({}, \"complete\", bufnr(\"%\"), a:findstart, a:base)'''.format(rpc_id)
-        funcdef('ActualVimComplete(findstart, base)', complete)
-
-        # FIXME: these just hang for now
-        funcdef('ActualVimWinCmd(name, args)',  r'call rpcnotify({}, \"wincmd\",  bufnr(\"%\"), a:name, a:args)'.format(rpc_id))
-        funcdef('ActualVimTextCmd(name, args)', r'call rpcnotify({}, \"textcmd\", bufnr(\"%\"), a:name, a:args)'.format(rpc_id))
-        funcdef('ActualVimAppCmd(name, args)',  r'call rpcnotify({}, \"appcmd\",  bufnr(\"%\"), a:name, a:args)'.format(rpc_id))
-
-        self.nvim_mode = False
+            return ('nvim_eval', [r'''execute(":function! {} \n {} \n endfunction")'''.format(prototype, body)])
+
+        # everything goes to nvim as one atomic batch instead of a round trip per step
+        calls = [
+            # toss in <FocusGained> in case there's a blocking prompt on startup (like vimrc errors)
+            ('nvim_input', ['<FocusGained>']),
+            ('nvim_eval', ['execute("messages")']),
+            # set up UI (before anything else so we can see errors)
+            ('nvim_ui_attach', [self.width, self.height, options]),
+            # hidden buffers allow us to multiplex them
+            ('nvim_set_option', ['hidden', True]),
+            # folds aren't implemented
+            ('nvim_command', ['set nofoldenable']),
+            ('nvim_command', ['augroup ActualVim | autocmd! | augroup END']),
+            # ('nvim_command', [autocmd.format('BufWritePre', 'write_pre')]),
+            ('nvim_command', [autocmd.format('BufReadCmd', 'read')]),
+            ('nvim_command', [autocmd.format('BufWriteCmd', 'write')]),
+            ('nvim_command', [autocmd.format('BufEnter', 'enter')]),
+            # set up autocomplete from Sublime via completefunc (ctrl-x, ctrl-u)
+            # controlled via bufopts['completefunc'] in ActualVim settings
+            funcdef('ActualVimComplete(findstart, base)',
+                    r'''return rpcrequest({}, \"complete\", bufnr(\"%\"), a:findstart, a:base, line(\".\"), col(\".\"))'''.format(rpc_id)),
+            # late completions from Sublime plugins, dropped if the cursor left the completed word
+            funcdef('ActualVimCompleteAsync(line, col, base, items)', r' \n '.join([
+                r"if mode() !=# 'i' || line('.') != a:line || col('.') < a:col | return | endif",
+                r"let typed = strpart(getline('.'), a:col - 1, col('.') - a:col)",
+                r"if stridx(typed, a:base) != 0 | return | endif",
+                # still browsing the first menu, or typed further and the menu has been filtered
+                r"let prefix = pumvisible() ? a:base : typed",
+                r"call complete(a:col, filter(a:items, 'stridx(v:val.word, prefix) == 0'))",
+            ])),
+            # FIXME: these just hang for now
+            funcdef('ActualVimWinCmd(name, args)',  r'call rpcnotify({}, \"wincmd\",  bufnr(\"%\"), a:name, a:args)'.format(rpc_id)),
+            funcdef('ActualVimTextCmd(name, args)', r'call rpcnotify({}, \"textcmd\", bufnr(\"%\"), a:name, a:args)'.format(rpc_id)),
+            funcdef('ActualVimAppCmd(name, args)',  r'call rpcnotify({}, \"appcmd\",  bufnr(\"%\"), a:name, a:args)'.format(rpc_id)),
+            # missing on older nvim, so it goes last
+            ('nvim_get_mode', []),
+        ]
         try:
-            res = self.nv.request('nvim_get_mode')
-            if isinstance(res, dict):
-                self.nvim_mode = True
+            results, err = self.nv.request('nvim_call_atomic', calls)
         except neovim.api.NvimError:
-            pass
+            # no nvim_call_atomic, send them one at a time
+            results, err = [], None
+            for i, (name, call_args) in enumerate(calls):
+                try:
+                    results.append(self.nv.request(name, *call_args))
+                except neovim.api.NvimError as e:
+                    err = [i, 0, str(e)]
+                    break
+        self._phase('setup')
 
-    def _event_loop(self):
-        def on_notification(method, data):
-            # if vim exits, we might get a notification on the way out
-            if not (_loaded or _loading):
-                return
+        if err and err[0] < len(calls) - 1:
+            print('ActualVim: nvim setup failed at {}: {}'.format(calls[err[0]][0], err[2]))
 
-            if method == 'redraw':
+        # a server we reattached to has its whole message history in there
+        messages = results[1].strip() if len(results) > 1 and not self.reattached else ''
+        if messages:
+            print('ActualVim: nvim startup error:')
+            print('-'*20)
+            print(messages)
+            print('-'*20)
+            sublime.active_window().run_command('show_panel', {'panel': 'console'})
+
+        self.nvim_mode = len(results) == len(calls) and isinstance(results[-1], dict)
+
+        if self.persistent:
+            self.pid = self.eval('getpid()')
+            self._reconcile()
+
+    def _attach_server(self, args, reattach=True):
+        path = server_path()
+        if reattach and os.path.exists(path):
+            try:
+                nv = neovim.attach('socket', path=path, backend=rpc_backend())
+                print('ActualVim: reattached to nvim server at', path)
+                self.reattached = True
+                return nv
+            except Exception:
+                print('ActualVim: stale nvim server socket at', path)
+        start_server(path, args)
+        return neovim.attach('socket', path=path, backend=rpc_backend())
+
+    def _reconcile(self):
+        # map buffers from a previous load back to their views, and wipe the ones whose view is gone
+        live = {view.id() for window in sublime.windows() for view in window.views()}
+        for buf in self.nv.buffers:
+            vid = buf.vars.get('actualvim_view')
+            if vid is None:
+                continue
+            # a view id from another Sublime session is a different view
+            if vid in live and buf.vars.get('actualvim_session') == session:
+                self.orphans[vid] = buf
+            else:
+                self.cmd('bw! {:d}'.format(buf.number))
+        if self.orphans:
+            print('ActualVim: found {} buffers in nvim server'.format(len(self.orphans)))
+
+    def view_lock(self, av):
+        # a view's redraw-driven work and its buffer events are dispatched on different keys
+        # (see dispatch_key) but touch the same view state, so they take the view's lock
+        lock = getattr(av, 'event_lock', None)
+        return lock if lock is not None else self.event_lock
+
+    def on_notification(self, method, data):
+        if method == 'redraw':
+            av = self.av
+            with self.view_lock(av):
                 for cmd in data:
                     name, args = cmd[0], cmd[1:]
                     # TODO: allow subscribing to these
-                    if name == 'bell' and self.av:
-                        self.av.on_bell()
+                    if name == 'bell' and av:
+                        av.on_bell()
+                    elif name == 'mode_change':
+                        if args and args[-1][0] in BLOCKING_UI_MODES:
+                            self.hint_blocked()
                     elif name in ('popupmenu_show', 'popupmenu_hide', 'popupmenu_select'):
-                        self.av.on_popupmenu(name, args)
+                        if av:
+                            av.on_popupmenu(name, args)
                     elif name in ('cmdline_show', 'cmdline_pos', 'cmdline_special_char', 'cmdline_hide',
                             'cmdline_block_show', 'cmdline_block_append', 'cmdline_block_hide'):
-                        self.av.on_cmdline(name, args)
-                vim.screen.redraw(data)
-                if self.av:
-                    self.av.on_redraw(data, vim.screen)
-            elif method == 'nvim_buf_lines_event':
-                buf, changedtick, start, end, lines, more = data
-                av = self.views.get(buf.number)
+                        if name == 'cmdline_show':
+                            self.hint_blocked()
+                        if av:
+                            av.on_cmdline(name, args)
+                self.screen.redraw(data)
                 if av:
+                    av.on_redraw(data, self.screen)
+        elif method == 'nvim_buf_lines_event':
+            buf, changedtick, start, end, lines, more = data
+            av = self.views.get(buf.number)
+            if av:
+                with self.view_lock(av):
                     av.on_nvim_lines(changedtick, start, end, lines, more)
-            elif method == 'nvim_buf_changedtick_event':
-                buf, changedtick = data
-                av = self.views.get(buf.number)
-                if av:
+        elif method == 'nvim_buf_changedtick_event':
+            buf, changedtick = data
+            av = self.views.get(buf.number)
+            if av:
+                with self.view_lock(av):
                     av.on_nvim_changedtick(changedtick)
-            elif method == 'appcmd':
-                av = self.views.get(data[0])
-                if av:
-                    av.on_appcmd(data[1], data[2])
-            elif method == 'wincmd':
-                av = self.views.get(data[0])
-                if av:
-                    av.on_wincmd(data[1], data[2])
-            elif method == 'textcmd':
-                av = self.views.get(data[0])
-                if av:
-                    av.on_textcmd(data[1], data[2])
+        elif method == 'appcmd':
+            av = self.views.get(data[0])
+            if av:
+                av.on_appcmd(data[1], data[2])
+        elif method == 'wincmd':
+            av = self.views.get(data[0])
+            if av:
+                av.on_wincmd(data[1], data[2])
+        elif method == 'textcmd':
+            av = self.views.get(data[0])
+            if av:
+                av.on_textcmd(data[1], data[2])
+
+    def _event_loop(self):
+        def on_notification(method, data):
+            # if vim exits, we might get a notification on the way out
+            if not (_loaded or _loading):
+                return
+            self.on_notification(method, data)
 
         def on_request(method, args):
             # TODO: what if I need to handle requests that don't start with bufid?
@@ -247,12 +727,52 @@ class Vim:
                 # TODO: focus view?
                 pass
             elif method == 'complete':
-                return av.on_complete(args[0], args[1])
+                return av.on_complete(*args)
 
         def on_setup():
             self._sem.release()
 
-        self.nv.run_loop(on_request, on_notification, on_setup)
+        def dispatch_key(method, arg):
+            # one view's buffer events and requests stay in order, but don't wait on other views
+            # ui events (redraw) aren't keyed, so they're handled in order on the shared queue
+            if method in BUFFER_EVENTS:
+                return arg.number
+            elif method in VIEW_EVENTS or method in VIEW_REQUESTS:
+                return int(arg)
+            return None
+
+        try:
+            self.nv.run_loop(on_request, on_notification, on_setup, dispatch_key=dispatch_key)
+        finally:
+            self.exited = True
+            vim_exited(self)
+
+    def quit(self):
+        self.quitting = True
+        try:
+            self.nv.command('qa!', async=True)
+        except Exception:
+            pass
+
+    def kill(self):
+        # for a server that didn't quit when asked, it would keep running next to its replacement
+        self.quitting = True
+        if self.pid is None:
+            return
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def detach(self):
+        # drop our connection but leave a persistent server (and its buffers) running
+        self.quitting = True
+        try:
+            self.cmd('augroup ActualVim | autocmd! | augroup END')
+            self.nv.ui_detach()
+        except Exception:
+            pass
+        self.nv.close()
 
     def cmd(self, *args, **kwargs):
         return self.nv.command_output(*args, **kwargs)
@@ -278,6 +798,21 @@ class Vim:
         buf.options['buftype'] = 'acwrite'
         for k, v in settings.get('bufopts').items():
             buf.options[k] = v
+        buf.vars['actualvim_view'] = view.view.id()
+        buf.vars['actualvim_session'] = session
+        self.views[buf.number] = view
+        return buf
+
+    def buf_adopt(self, view):
+        # reuse a buffer a persistent server kept for this view, if any
+        buf = self.orphans.pop(view.view.id(), None)
+        if buf is None:
+            return None
+        # the view may have been reused for another file since
+        path, name = view.view.file_name(), buf.name
+        if bool(path) != bool(name) or (path and os.path.normpath(path) != os.path.normpath(name)):
+            self.cmd('bw! {:d}'.format(buf.number))
+            return None
         self.views[buf.number] = view
         return buf
 
@@ -287,40 +822,77 @@ class Vim:
 
     # neovim 'readiness' methods
     # if you don't use check/force_ready and control your input/cmd interleaving, you'll hang all the time
+    # readiness is only marked READY by an actual nvim_get_mode answer,
+    # mode_change/cmdline_show redraw events can only mark it BLOCKED (see hint_blocked)
+    def set_ready_state(self, state):
+        with self.ready_cond:
+            self.ready_state = state
+            self.ready_changed = time.time()
+            self.ready_cond.notify_all()
+
+    def hint_blocked(self):
+        # redraws are handled on a dispatcher worker and can arrive after the nvim_get_mode answer
+        # to the same key, so a hint only counts while that answer is still outstanding
+        with self.ready_cond:
+            if self.ready_state == BUSY:
+                self.set_ready_state(BLOCKED)
+
+    def wait_ready(self, timeout=0.005):
+        deadline = time.time() + timeout
+        with self.ready_cond:
+            while self.ready_state == BUSY:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.ready_cond.wait(remaining)
+            return self.ready_state
+
     def check_ready(self):
-        ready = self.ready.acquire(False)
-        if ready:
-            self.ready.release()
+        state = self.ready_state
+        if state != READY and self.nvim_mode and time.time() - self.ready_changed > READY_EXPIRY:
+            # a BLOCKED hint from a redraw, or a press that never finished, may be long stale
+            try:
+                return self.probe_ready()
+            except Exception:
+                return False
+        return state == READY
+
+    def probe_ready(self):
+        res = self.nv.request('nvim_get_mode') or {}
+        ready = not res.get('blocking', True)
+        self.set_ready_state(READY if ready else BLOCKED)
         return ready
 
     def force_ready(self):
-        for i in range(3):
-            if self.check_ready():
-                break
-            time.sleep(0.0001)
-        else:
-            self.nv.input('<c-\\><c-n>')
+        if self.wait_ready() == READY:
+            return
+        # a BLOCKED hint may be stale, so ask before escaping
+        if self.nvim_mode and self.probe_ready():
+            return
+        self.nv.input('<c-\\><c-n>')
+        self.set_ready_state(READY)
 
     def press(self, key, onready=None):
         self.status_dirty = True
-        mode_last = self.status_last.get('mode')
-        was_ready = self.ready.acquire(False)
+        prev = self.ready_state
+        self.set_ready_state(BUSY)
 
-        ret = self.nv.input(key)
+        try:
+            ret = self.nv.input(key)
+        except Exception:
+            # the key never made it to nvim
+            self.set_ready_state(prev)
+            raise
+        tracer.mark('input')
         if self.nvim_mode:
-            res = self.nv.request('nvim_get_mode') or {}
-            ready = not res.get('blocking', True)
+            ready = self.probe_ready()
+            tracer.mark('mode check')
         else:
             ready = False
             def tmp():
-                # need to acquire/release so ready lock doesn't get stuck
-                self.ready.acquire(False)
-                self.ready.release()
+                self.set_ready_state(READY)
                 onready()
             self.status(cb=tmp)
-
-        if ready:
-            self.ready.release()
         return ret, ready
 
     def status(self, update=True, force=False, cb=None):
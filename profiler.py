@@ -0,0 +1,148 @@
+# profiler.py
+# a sampling profiler for the plugin's threads (sublime main thread, session worker, event loop / pipe reader)
+#
+# cProfile only sees the thread it was enabled on, so instead a background thread walks
+# sys._current_frames() every interval and counts the stacks that pass through this package.
+# stop() writes two files from the same samples:
+#   <name>.pstats  marshalled pstats data, for `python -m pstats`, snakeviz or gprof2dot
+#   <name>.folded  collapsed stacks (thread;outer;...;inner count), for flamegraph.pl or speedscope
+
+import collections
+import marshal
+import os
+import sys
+import threading
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# seconds between samples, walking every thread's stack holds the GIL, so much finer and the
+# profiler starts showing up in its own profiles (see the profile_interval setting)
+INTERVAL = 0.005
+
+
+def frame_key(code):
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def frame_label(key):
+    filename, line, name = key
+    return '{} ({}:{})'.format(name, os.path.basename(filename), line)
+
+
+def thread_key(name):
+    # pseudo function at the root of each thread's stacks, so pstats can tell threads apart
+    return ('~', 0, '<thread {}>'.format(name))
+
+
+class Profiler:
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.started = 0
+        self.elapsed = 0
+        self.samples = 0
+        # (thread name, (root frame key, ..., leaf frame key)) -> count
+        self.stacks = collections.Counter()
+
+    def start(self, interval=None):
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            if interval is not None:
+                self.interval = interval
+            self.stacks.clear()
+            self.samples = 0
+            self.started = time.time()
+            self.thread = threading.Thread(target=self._run, name='ActualVim profiler', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            thread, self.thread = self.thread, None
+        thread.join()
+        self.elapsed = time.time() - self.started
+
+    def _run(self):
+        me = threading.get_ident()
+        while self.running:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                ours = False
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(frame_key(code))
+                    if not ours and code.co_filename.startswith(PACKAGE_DIR):
+                        ours = True
+                    frame = frame.f_back
+                if ours:
+                    stack.reverse()
+                    self.stacks[(names.get(ident, str(ident)), tuple(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def folded(self):
+        lines = []
+        for (name, stack), count in sorted(self.stacks.items()):
+            frames = [name] + [frame_label(key) for key in stack]
+            lines.append('{} {}'.format(';'.join(f.replace(';', ':') for f in frames), count))
+        return lines
+
+    def pstats(self):
+        # sampled equivalent of cProfile's stats: call counts are sample counts and times are
+        # samples * the effective interval, so ratios between functions are what matters
+        dt = self.elapsed / self.samples if self.samples else self.interval
+        # func -> [cc, nc, tt, ct, {caller: [cc, nc, tt, ct]}]
+        stats = {}
+
+        def entry(func):
+            if func not in stats:
+                stats[func] = [0, 0, 0.0, 0.0, {}]
+            return stats[func]
+
+        for (name, stack), count in self.stacks.items():
+            stack = (thread_key(name),) + stack
+            seen = set()
+            for i, func in enumerate(stack):
+                e = entry(func)
+                e[1] += count
+                # recursive frames only count towards cumulative time once
+                if func not in seen:
+                    seen.add(func)
+                    e[0] += count
+                    e[3] += count * dt
+                if i == len(stack) - 1:
+                    e[2] += count * dt
+                if i > 0:
+                    c = e[4].setdefault(stack[i - 1], [0, 0, 0.0, 0.0])
+                    c[0] += count
+                    c[1] += count
+                    c[3] += count * dt
+                    if i == len(stack) - 1:
+                        c[2] += count * dt
+
+        return {func: (cc, nc, tt, ct, {caller: tuple(v) for caller, v in callers.items()})
+                for func, (cc, nc, tt, ct, callers) in stats.items()}
+
+    def save(self, path):
+        # path without extension, returns the files written
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pstats_path = path + '.pstats'
+        folded_path = path + '.folded'
+        with open(pstats_path, 'wb') as f:
+            marshal.dump(self.pstats(), f)
+        with open(folded_path, 'w', encoding='utf8') as f:
+            f.write('\n'.join(self.folded()) + '\n')
+        return pstats_path, folded_path
+
+if not 'profiler' in globals():
+    profiler = Profiler()
@@ -0,0 +1,152 @@
+# replay.py
+# reads rpc recordings (see Vim.start_recording) and feeds the recorded nvim traffic back through
+# Screen.redraw and the notification handling in neo.py, without a live nvim
+
+import os
+import time
+
+from .lib import msgpack
+from .lib.neovim.api.common import decode_if_bytes, walk
+from .lib.neovim.msgpack_rpc.msgpack_stream import INBOUND, RECORDING_MAGIC
+from .words import WordIndex
+
+REQUEST = 0
+RESPONSE = 1
+NOTIFICATION = 2
+
+BUFFER_EVENTS = ('nvim_buf_lines_event', 'nvim_buf_changedtick_event')
+
+
+class Handle:
+    # stands in for the Buffer/Window/Tabpage objects nvim sends as ext types
+    def __init__(self, code, data):
+        self.code = code
+        self.handle = msgpack.unpackb(data)
+
+    @property
+    def number(self):
+        return self.handle
+
+    def __repr__(self):
+        return '<Handle {}:{}>'.format(self.code, self.handle)
+
+
+class View:
+    # stands in for an ActualVim view, so buffer events have somewhere to go: it mirrors the
+    # buffer the way the word index does, without touching any real Sublime view
+    def __init__(self):
+        self.words = WordIndex()
+        self.changedtick = None
+
+    def on_nvim_lines(self, changedtick, start, end, lines, more):
+        self.words.update(start, end, lines, changedtick)
+        self.changedtick = changedtick
+
+    def on_nvim_changedtick(self, changedtick):
+        self.changedtick = changedtick
+
+
+def decode(obj):
+    if isinstance(obj, msgpack.Ext):
+        return Handle(obj.code, obj.data)
+    return decode_if_bytes(obj)
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(data)
+    entries = iter(unpacker)
+    header = next(entries, None)
+    if not header or decode_if_bytes(header[0]) != RECORDING_MAGIC:
+        raise ValueError('{} is not an rpc recording'.format(path))
+
+    out = []
+    for t, direction, chunk in entries:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf8', 'surrogateescape')
+        out.append((t, direction, chunk))
+    return out
+
+
+def latest(directory):
+    try:
+        names = [n for n in os.listdir(directory) if n.endswith('.msgpack')]
+    except OSError:
+        return None
+    if not names:
+        return None
+    return os.path.join(directory, max(names))
+
+
+class Replay:
+    def __init__(self, entries):
+        self.entries = entries
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load(path))
+
+    @property
+    def duration(self):
+        return self.entries[-1][0] if self.entries else 0
+
+    def messages(self, direction=INBOUND):
+        # yields (recorded time, decoded message), unpacking each chunk as it was received
+        unpacker = msgpack.Unpacker()
+        for t, d, chunk in self.entries:
+            if d != direction:
+                continue
+            unpacker.feed(chunk)
+            for msg in unpacker:
+                yield t, walk(decode, msg)
+
+    def buffers(self):
+        # numbers of the buffers that got buffer events in the recording
+        return {args[0].number for _, (kind, method, args) in
+                ((t, msg[:3]) for t, msg in self.messages())
+                if kind == NOTIFICATION and method in BUFFER_EVENTS}
+
+    def run(self, vim=None, views=None):
+        # vim defaults to a headless neo.Vim, views map buffer numbers to ActualVim-like objects
+        # and default to a View per recorded buffer
+        if vim is None:
+            from .neo import Vim
+            vim = Vim.headless()
+        if views is None:
+            views = {number: View() for number in self.buffers()}
+        vim.views.update(views)
+
+        stats = {
+            'recorded_s': self.duration,
+            'messages': 0,
+            'decode_ms': 0,
+            'dispatch_ms': 0,
+            'notifications': {},
+        }
+        messages = self.messages()
+        start = time.time()
+        while True:
+            # time spent in the generator is unpacking and decoding
+            t0 = time.time()
+            item = next(messages, None)
+            t1 = time.time()
+            stats['decode_ms'] += (t1 - t0) * 1000
+            if item is None:
+                break
+            _, msg = item
+            stats['messages'] += 1
+            if msg[0] != NOTIFICATION:
+                continue
+            method, args = msg[1], msg[2]
+            vim.on_notification(method, args)
+            elapsed = (time.time() - t1) * 1000
+            stats['dispatch_ms'] += elapsed
+            entry = stats['notifications'].setdefault(method, {'count': 0, 'total_ms': 0})
+            entry['count'] += 1
+            entry['total_ms'] += elapsed
+        stats['total_ms'] = (time.time() - start) * 1000
+        stats['buffers'] = {number: len(view.words.lines or ()) for number, view in views.items()
+                            if isinstance(view, View)}
+        return stats
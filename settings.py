@@ -12,8 +12,41 @@ DEFAULT_SETTINGS = {
         "lines": 50000,
     },
     'smooth_scroll': False,
+    # max UI updates per second from vim (0 to flush on the next tick)
+    "ui_fps": 60,
+    # batch nvim line events arriving less than `threshold` seconds apart for `timeout` seconds
+    # when adaptive, both are sized from measured apply cost to keep main thread use under `target`
+    "lines_debounce": {
+        "adaptive": True,
+        "target": 0.5,
+        "min": 0.002,
+        "max": 0.25,
+        "threshold": 0.01,
+        "timeout": 0.05,
+    },
     "neovim_path": "",
     "neovim_args": ["--cmd", "let g:actualvim = 1"],
+    # how we talk to nvim: "pipe" (a reader thread on the raw pipe) or "default" (pyuv or asyncio)
+    "rpc_transport": "default",
+    # count rpc traffic and latency per method, see "ActualVim: Show RPC Stats"
+    "rpc_metrics": False,
+    # if set, serve those metrics in Prometheus text format on this unix socket path
+    "rpc_metrics_socket": "",
+    # time each keystroke through the plugin, see "ActualVim: Show Key Latency"
+    "key_trace": False,
+    # seconds between "ActualVim: Start Profiling" samples
+    "profile_interval": 0.005,
+    # start nvim when a view is first activated instead of at plugin load
+    "lazy_start": True,
+    # run nvim as a server on a private unix socket, which survives plugin reloads
+    "persistent_server": False,
+    # keep a spare nvim running, for instant recovery if nvim dies and for plugin reloads
+    "standby": False,
+    # how views are spread across nvim instances: single, window, project or round_robin
+    "nvim_pool": {
+        "mode": "single",
+        "size": 2,
+    },
     "settings_priority": "sublime",
     "settings": {
         "sublime": {
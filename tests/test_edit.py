@@ -0,0 +1,59 @@
+# test_edit.py
+# run from a checkout named ActualVim: python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ActualVim.bench import sublime_stub
+sublime_stub.install()
+
+import sublime
+from ActualVim.edit import Edit
+
+
+def text(view):
+    return view.substr(sublime.Region(0, view.size()))
+
+
+class EditTest(unittest.TestCase):
+    def setUp(self):
+        sublime_stub.run_timeouts()
+        self.view = sublime.active_window().new_file()
+        self.view.insert(None, 0, 'hello world')
+
+    def test_with_block_applies_on_exit(self):
+        with Edit(self.view) as edit:
+            edit.replace(sublime.Region(0, 5), 'howdy')
+            edit.append('!')
+        self.assertEqual(text(self.view), 'howdy world!')
+
+    def test_with_block_applies_deferred_edits_first(self):
+        Edit.defer(self.view, lambda view, edit: view.insert(edit, 0, '> '))
+        with Edit(self.view) as edit:
+            edit.append('!')
+        self.assertEqual(text(self.view), '> hello world!')
+        # the tick the deferred edit was queued for has nothing left to do
+        sublime_stub.run_timeouts()
+        self.assertEqual(text(self.view), '> hello world!')
+
+    def test_defer_waits_for_the_next_tick(self):
+        Edit.defer(self.view, lambda view, edit: view.erase(edit, sublime.Region(5, view.size())))
+        Edit.defer(self.view, lambda view, edit: view.insert(edit, view.size(), '?'))
+        self.assertEqual(text(self.view), 'hello world')
+        sublime_stub.run_timeouts()
+        self.assertEqual(text(self.view), 'hello?')
+
+    def test_with_block_inside_an_edit_follows_it(self):
+        def outer(view, edit):
+            with Edit(view) as inner:
+                inner.append('!')
+            view.insert(edit, 0, '> ')
+        Edit.defer(self.view, outer)
+        Edit.commit(self.view)
+        self.assertEqual(text(self.view), '> hello world!')
+
+
+if __name__ == '__main__':
+    unittest.main()
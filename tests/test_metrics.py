@@ -0,0 +1,59 @@
+# test_metrics.py
+# run from a checkout named ActualVim: python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ActualVim.bench import sublime_stub
+sublime_stub.install()
+
+from ActualVim.lib.neovim.msgpack_rpc import metrics
+
+
+def traffic(m, methods):
+    for i, method in enumerate(methods):
+        m.request_sent(i, method)
+        m.response_received(i, None)
+
+
+class PrometheusTest(unittest.TestCase):
+    def test_families_merge_across_instances(self):
+        a, b = metrics.RpcMetrics(), metrics.RpcMetrics()
+        traffic(a, ['nvim_input', 'nvim_eval'])
+        traffic(b, ['nvim_input'])
+        lines = metrics.prometheus([({'instance': 'primary'}, a), ({'instance': 'window 2'}, b)])
+
+        types = [line.split()[2] for line in lines if line.startswith('# TYPE')]
+        self.assertEqual(len(types), len(set(types)))
+
+        # every sample follows its own family's TYPE line
+        family = None
+        for line in lines:
+            if line.startswith('# TYPE'):
+                family = line.split()[2]
+                continue
+            name = line.split('{')[0].split(' ')[0]
+            if family.endswith('latency_seconds'):
+                self.assertIn(name, [family + s for s in ('_bucket', '_sum', '_count')])
+            else:
+                self.assertEqual(name, family)
+
+        sent = [line for line in lines if line.startswith('nvim_rpc_requests_sent_total{')]
+        self.assertEqual(sent, [
+            'nvim_rpc_requests_sent_total{instance="primary",method="nvim_eval"} 1',
+            'nvim_rpc_requests_sent_total{instance="primary",method="nvim_input"} 1',
+            'nvim_rpc_requests_sent_total{instance="window 2",method="nvim_input"} 1',
+        ])
+
+    def test_single_instance(self):
+        m = metrics.RpcMetrics()
+        traffic(m, ['nvim_input'])
+        self.assertEqual(m.prometheus(labels={'instance': 'primary'}),
+                         metrics.prometheus([({'instance': 'primary'}, m)]))
+        self.assertIn('nvim_rpc_in_flight{instance="primary"} 0', m.prometheus(labels={'instance': 'primary'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
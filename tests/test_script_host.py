@@ -0,0 +1,58 @@
+# test_script_host.py
+# run from a checkout named ActualVim: python3 -m unittest discover tests
+
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ActualVim.bench import sublime_stub
+sublime_stub.install()
+
+from ActualVim.lib.neovim.plugin.script_host import ScriptHost
+
+
+class FakeNvim:
+    # just the buffer api pydo uses, set_lines calls arrive through nvim_call_atomic
+    error = Exception
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+        api = types.SimpleNamespace(get_lines=lambda start, end, strict: self.lines[start:end])
+        self.current = types.SimpleNamespace(buffer=types.SimpleNamespace(api=api))
+
+    def request(self, method, calls):
+        assert method == 'nvim_call_atomic'
+        for name, (buf, start, end, strict, lines) in calls:
+            assert name == 'nvim_buf_set_lines'
+            self.lines[start:end] = lines
+        return [[None] * len(calls), None]
+
+
+def pydo(lines, code, start=1, stop=None):
+    host = ScriptHost.__new__(ScriptHost)
+    host.nvim = FakeNvim(lines)
+    host.module = types.ModuleType('__main__')
+    host._set_current_range = lambda start, stop: None
+    host.python_do_range(start, len(lines) if stop is None else stop, code)
+    return host.nvim.lines
+
+
+class PydoTest(unittest.TestCase):
+    def test_rewrites_every_line(self):
+        self.assertEqual(pydo(['a', 'b', 'c'], 'return line.upper()'), ['A', 'B', 'C'])
+
+    def test_skipped_line_ends_the_range_before_it(self):
+        # the run before a skipped line replaces exactly its own lines, it used to stop one short
+        # and insert them instead
+        lines = pydo(['a', 'b', 'c', 'd', 'e'], 'return None if line == "c" else line.upper()')
+        self.assertEqual(lines, ['A', 'B', 'c', 'D', 'E'])
+
+    def test_partial_range(self):
+        lines = pydo(['a', 'b', 'c', 'd'], 'return None if linenr == 3 else line * 2', start=2, stop=4)
+        self.assertEqual(lines, ['a', 'bb', 'c', 'dd'])
+
+
+if __name__ == '__main__':
+    unittest.main()
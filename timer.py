@@ -0,0 +1,85 @@
+# timer.py
+# a single shared thread that owns timed callbacks (like debounce windows) for all views
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+
+class Timer:
+    def __init__(self, heap, func):
+        self.heap = heap
+        self.func = func
+        self.deadline = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.heap.cancel(self)
+
+    def reschedule(self, delay):
+        self.heap.reschedule(self, delay)
+
+    @property
+    def pending(self):
+        return not self.cancelled and self.deadline is not None
+
+
+class TimerHeap:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.heap = []
+        self.seq = itertools.count()
+        self.thread = None
+
+    def schedule(self, delay, func):
+        timer = Timer(self, func)
+        self.reschedule(timer, delay)
+        return timer
+
+    def reschedule(self, timer, delay):
+        with self.cond:
+            timer.cancelled = False
+            timer.deadline = time.time() + delay
+            # stale heap entries for this timer are skipped when their deadline no longer matches
+            heapq.heappush(self.heap, (timer.deadline, next(self.seq), timer))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def cancel(self, timer):
+        with self.cond:
+            timer.cancelled = True
+            timer.deadline = None
+
+    def _pop_due(self):
+        # must hold self.cond, returns a due timer or the time to wait until the next one
+        while self.heap:
+            deadline, _, timer = self.heap[0]
+            if timer.cancelled or timer.deadline != deadline:
+                heapq.heappop(self.heap)
+                continue
+            wait = deadline - time.time()
+            if wait > 0:
+                return None, wait
+            heapq.heappop(self.heap)
+            timer.deadline = None
+            return timer, 0
+        return None, None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                timer, wait = self._pop_due()
+                if not timer:
+                    self.cond.wait(wait)
+                    continue
+            try:
+                timer.func()
+            except Exception:
+                traceback.print_exc()
+
+if not 'timers' in globals():
+    timers = TimerHeap()
@@ -7,8 +7,57 @@ import time
 
 from . import neo
 from . import settings
+from .debounce import AdaptiveDebounce
 from .edit import Edit
-
+from .frame import FrameScheduler
+from .keytrace import tracer
+from .timer import timers
+from .words import WordIndex
+
+
+# keys kept while nvim starts, more than this and something is wrong
+PENDING_KEYS_MAX = 256
+
+# popupmenu rows rendered at once, around the selection
+POPUP_ROWS = 20
+
+POPUP_TEMPLATE = '''
+    <style>
+        .actualvim-popup-item-selected {{
+            background-color: color(var(--background) blend(grey 80%));
+        }}
+        .actualvim-popup-item {{
+            padding: 6px 14px 6px 14px;
+        }}
+        .actualvim-popup-kind {{
+            padding-left: 10px;
+            color: color(var(--foreground) alpha(0.5));
+        }}
+        .actualvim-popup-scroll {{
+            padding: 2px 14px 2px 14px;
+            color: color(var(--foreground) alpha(0.5));
+        }}
+        html, body, #actualvim-popup {{
+            padding: 0;
+            margin: 0;
+        }}
+    </style>
+    <div id="actualvim-popup">
+    {items}
+    {scroll}
+    </div>
+'''
+POPUP_ITEM = '<div class="actualvim-popup-item">{text}{kind}</div>'
+POPUP_KIND = '<span class="actualvim-popup-kind">{kind}</span>'
+POPUP_SCROLL = '<div class="actualvim-popup-scroll">{first}-{last} of {count}</div>'
+
+def vim_item(completion):
+    # sublime completions are a word or a [trigger, contents] pair, the trigger may carry a \t hint
+    if isinstance(completion, str):
+        return {'word': completion}
+    trigger, contents = completion[0], completion[1]
+    abbr, _, menu = trigger.partition('\t')
+    return {'word': contents, 'abbr': abbr, 'menu': menu}
 
 def copy_sel(sel):
     if isinstance(sel, sublime.View):
@@ -21,12 +70,36 @@ def neovim_loaded():
     global neo
     from . import neo
 
+    # views still pointing at an nvim from before a reload start over on the new one
+    for av in list(_views.values()):
+        if av.buf is not None and (av.nvim is None or av.nvim.quitting):
+            av.reset()
+
     if settings.enabled():
         ActualVim.enable()
 
 def neovim_unloaded():
     if neo._loaded and settings.enabled():
         ActualVim.enable(False)
+    # our nvim is quit or detached, each view re-activates against the next neo.vim
+    for av in list(_views.values()):
+        av.reset()
+
+# called by neo.py once a pooled nvim started in the background is up
+def neovim_pooled():
+    av = ActualVim.get(sublime.active_window().active_view(), create=False)
+    if av and av.buf is None:
+        av.activate()
+
+# called by neo.py after swapping out a dead or restarted nvim
+def neovim_replaced(old, new):
+    for av in list(_views.values()):
+        if getattr(av, 'nvim', None) is old:
+            av.reset()
+
+    av = ActualVim.get(sublime.active_window().active_view(), create=False)
+    if av:
+        av.activate()
 
 try:
     _views
@@ -39,12 +112,43 @@ class ActualVim:
         if view.settings().get('actual_proxy'):
             return
 
+        self.init_state(view)
+
+        en = settings.enabled()
+        s = {
+            'av_input': en,
+            'actual_mode': en,
+            # it's most likely a buffer will start in command mode
+            'inverse_caret_state': en,
+        }
+        for k, v in s.items():
+            view.settings().set(k, v)
+
+        lfd = settings.get('large_file_disable')
+        bytes = lfd.get('bytes', -1)
+        lines = lfd.get('lines', -1)
+        # TODO: view.lines() could be slow here
+        # hopefully view.size() shortcuts it
+        if (0 < bytes < view.size()) or (0 < lines < len(view.lines(sublime.Region(0, view.size())))):
+            fn = view.file_name() or view.name() or 'untitled'
+            print('ActualVim: disabling input for "{}" as size exceeds "large_file_disable" setting'.format(fn))
+            view.settings().set('av_input', False)
+
+    def init_state(self, view):
+        # everything but the view settings, reload_classes uses this to fill in attributes added since
         self.busy = threading.RLock()
+        # held while handling nvim events for this view, which arrive on more than one dispatch thread
+        self.event_lock = threading.RLock()
         self.update_needed = 0
         self.update_lock = threading.RLock()
         self.keyq = queue.Queue()
+        # keys pressed while nvim is still starting, replayed on activate
+        self.pending_keys = []
 
         self.view = view
+        self.frame = FrameScheduler(view)
+        # the pooled nvim instance owning our buffer, assigned on first use
+        self.nvim = None
         self.cmd_panel = None
         self.cmd_text = None
         self.cmd_lock = threading.Lock()
@@ -55,6 +159,10 @@ class ActualVim:
         self.vim_changes = None
         self.screen_changes = 0
         self.last_highlights = None
+        # per-line highlight spans we've added regions for, keyed by buffer line
+        self.highlight_lines = {}
+        # view change count when highlight_lines was last checked against the view
+        self.highlight_stamp = None
         self.last_status = None
         self.last_size = None
         self.block = False
@@ -67,6 +175,8 @@ class ActualVim:
         self.debounce_cond = threading.Condition()
         self.debounce_queue = []
         self.debounce_tick = None
+        self.debounce_timer = None
+        self.debounce = AdaptiveDebounce()
 
         # settings are marked here when applying mode-specific settings, and erased after
         self.tmpsettings = []
@@ -80,25 +190,11 @@ class ActualVim:
         # tracks popup menu status
         self.popup = None
 
-        en = settings.enabled()
-        s = {
-            'av_input': en,
-            'actual_mode': en,
-            # it's most likely a buffer will start in command mode
-            'inverse_caret_state': en,
-        }
-        for k, v in s.items():
-            view.settings().set(k, v)
-
-        lfd = settings.get('large_file_disable')
-        bytes = lfd.get('bytes', -1)
-        lines = lfd.get('lines', -1)
-        # TODO: view.lines() could be slow here
-        # hopefully view.size() shortcuts it
-        if (0 < bytes < view.size()) or (0 < lines < len(view.lines(sublime.Region(0, view.size())))):
-            fn = view.file_name() or view.name() or 'untitled'
-            print('ActualVim: disabling input for "{}" as size exceeds "large_file_disable" setting'.format(fn))
-            view.settings().set('av_input', False)
+        # buffer words for completion, and where the completion in progress starts
+        self.words = WordIndex()
+        self.complete_start = None
+        # (line, start col, base) of the last plugin completion query and the flags it returned
+        self.complete_flags = (None, 0)
 
     @classmethod
     def get(cls, view, create=True, exact=True):
@@ -126,9 +222,12 @@ class ActualVim:
         for vid, view in _views.items():
             new = cls.__new__(cls)
             nd = {}
-            # copy view dict first to get attrs, new second to get methods
+            # fresh state first, for attributes the old class didn't have
+            if 'view' in view.__dict__:
+                new.init_state(view.view)
+                nd.update(new.__dict__)
+            # copy view dict second to keep attrs
             nd.update(view.__dict__)
-            nd.update(new.__dict__)
             new.__dict__.update(nd)
             _views[vid] = new
 
@@ -149,6 +248,10 @@ class ActualVim:
                 av.sel_from_vim()
             av.update_view()
 
+    @property
+    def vim(self):
+        return getattr(self, 'nvim', None) or neo.vim
+
     @property
     def actual(self):
         return neo._loaded and self.view and self.settings.get('actual_mode') and self.settings.get('av_input')
@@ -204,7 +307,7 @@ class ActualVim:
             regions.append((a, b))
         elif name == 'visual block':
             # visual block mode
-            curswant = neo.vim.status()['wview']['curswant']
+            curswant = self.vim.status()['wview']['curswant']
             left = min(sc, ec)
             right = max(sc, ec, curswant) + 1
             top = min(sr, er)
@@ -255,7 +358,7 @@ class ActualVim:
         else:
             combined = top.get('vim', {})
             modes = combined.pop('modes')
-            mode = neo.vim.mode
+            mode = self.vim.mode
             name = neo.MODES.get(mode)
             combined.update(modes.get(name, {}))
             if mode in neo.VISUAL_MODES:
@@ -271,16 +374,37 @@ class ActualVim:
         return base
 
     def activate(self):
-        if not neo._loaded: return
-        neo.vim.force_ready()
+        if not neo._loaded:
+            if settings.enabled():
+                neo.start()
+            return
+        if self.buf is None:
+            self.nvim = neo.pool.get(self.view)
+            if self.nvim is None:
+                # our pooled nvim is starting, neovim_pooled() activates us again
+                return
+        self.vim.force_ready()
         # first activate
         if self.buf is None:
-            self.buf = neo.vim.buf_new(self)
-            # disable undo on first insert
-            self.buf.options['undolevels'] = -1
-            self.sync_to_vim()
-            # re-enable undo
-            self.buf.options['undolevels'] = -123456
+            self.buf = self.vim.buf_adopt(self)
+            if self.buf is not None:
+                # kept by a persistent nvim server, only sync if the text drifted
+                text = self.view.substr(sublime.Region(0, self.view.size())).split('\n')
+                if self.buf[:] == text:
+                    self.mark_changed()
+                    self.vim_changes = self.vim.eval('getbufvar({:d}, "changedtick")'.format(self.buf.number))
+                else:
+                    # don't let undo bring the old text back
+                    self.buf.options['undolevels'] = -1
+                    self.sync_to_vim()
+                    self.buf.options['undolevels'] = -123456
+            else:
+                self.buf = self.vim.buf_new(self)
+                # disable undo on first insert
+                self.buf.options['undolevels'] = -1
+                self.sync_to_vim()
+                # re-enable undo
+                self.buf.options['undolevels'] = -123456
             try:
                 self.buf.api.attach(True, {})
                 self.live = True
@@ -290,13 +414,43 @@ class ActualVim:
             if path:
                 self.set_path(path)
 
-        if neo.vim.activate(self):
+        if self.vim.activate(self):
             self.sel_to_vim()
             self.viewport_to_vim()
             self.status_from_vim()
             self.update_view()
             self.highlight()
 
+        if self.pending_keys:
+            keys, self.pending_keys = self.pending_keys, []
+            for key in keys:
+                self.press(key)
+
+    def reset(self):
+        # our nvim went away, so the next activate() rebuilds the buffer from the view
+        self.nvim = None
+        self.buf = None
+        self.live = False
+        self.vim_changes = None
+        self.sub_changes = None
+        self.last_sel = None
+        self.last_settings = {}
+        self.last_highlights = None
+        # the regions stay in the view, so keep their lines around to erase but drop their spans
+        self.highlight_lines = dict.fromkeys(self.highlight_lines)
+        self.highlight_stamp = None
+        # line events for the old buffer must not reach the new one
+        with self.debounce_cond:
+            if self.debounce_timer:
+                self.debounce_timer.cancel()
+                self.debounce_timer = None
+            self.debouncing = False
+            self.debounce_queue = []
+            self.debounce_tick = None
+        self.words.reset()
+        self.complete_start = None
+        self.popup = None
+
     def update_view(self):
         combined = self.avsettings.get('settings', {})
         for k in self.tmpsettings:
@@ -311,7 +465,7 @@ class ActualVim:
         width, height = vp[0] / view.em_width(), vp[1] / view.line_height()
         if self.actual:
             # TODO: don't hardcode bottom bar height as 2 (make setting? detect?)
-            neo.vim.resize(width, height + 2)
+            self.vim.resize(width, height + 2)
             # update_view is called all the time, and asking vim for things is expensive
             # so vim's tab priority comes automatically during sel_from_vim()
             if settings.get('settings_priority') == 'sublime':
@@ -323,20 +477,20 @@ class ActualVim:
         tmp['read_only'] = self.view.is_read_only()
         if tmp != self.last_settings:
             if tmp.get('translate_tabs_to_spaces'):
-                neo.vim.cmd('set expandtab ts={ts} shiftwidth={ts} softtabstop=0 smarttab'.format(ts=tmp['tab_size']))
-            else: neo.vim.cmd('set noexpandtab softtabstop=0')
+                self.vim.cmd('set expandtab ts={ts} shiftwidth={ts} softtabstop=0 smarttab'.format(ts=tmp['tab_size']))
+            else: self.vim.cmd('set noexpandtab softtabstop=0')
 
             if tmp['read_only']:
-                neo.vim.cmd('set noma')
-            else: neo.vim.cmd('set ma')
+                self.vim.cmd('set noma')
+            else: self.vim.cmd('set ma')
 
             if tmp.get('word_wrap') != self.last_settings.get('word_wrap'):
                 if tmp.get('word_wrap'):
-                    neo.vim.cmd('set wrap')
-                else: neo.vim.cmd('set nowrap')
+                    self.vim.cmd('set wrap')
+                else: self.vim.cmd('set nowrap')
                 self.viewport_to_vim()
 
-            neo.vim.status(force=True)
+            self.vim.status(force=True)
             self.last_settings = tmp
 
     def settings_from_vim(self, et, ts, wrap):
@@ -357,19 +511,25 @@ class ActualVim:
             return
 
         self.mark_changed()
-        neo.vim.force_ready()
+        self.vim.force_ready()
         text = self.view.substr(sublime.Region(0, self.view.size())).split('\n')
         if self.live:
             bufid = self.buf.number
-            neo.vim.nv.request('nvim_call_atomic', [
+            results, _ = self.vim.nv.request('nvim_call_atomic', [
                 ('nvim_buf_detach', [bufid]),
                 ('nvim_buf_set_lines', [bufid, 0, -1, False, text]),
+                ('nvim_buf_get_changedtick', [bufid]),
                 ('nvim_buf_attach', [bufid, False, {}]),
             ])
+            # reattaching doesn't resend the buffer, and lines events from before the
+            # detach may still be on their way to the index
+            tick = results[2] if len(results) > 2 else None
+            self.words.reset(text, tick)
         else:
             self.buf[:] = text
+            self.words.reset(text)
         self.sel_to_vim(force)
-        self.vim_changes = neo.vim.status()['changedtick']
+        self.vim_changes = self.vim.status()['changedtick']
 
     def sync_from_vim(self, edit=None, lines_event=None, resync=False):
         if not self.actual: return
@@ -377,7 +537,7 @@ class ActualVim:
             return
 
         if self.live and not lines_event:
-            tick = neo.vim.status()['changedtick']
+            tick = self.vim.status()['changedtick']
             # wait for the update event
             if tick > self.vim_changes:
                 return
@@ -394,6 +554,7 @@ class ActualVim:
                         # TODO: write this in C
                         if self.vim_changes is None or tick > self.vim_changes:
                             self.vim_changes = tick
+                            applied = time.time()
                             # TODO: sublime apis can be slow if there are a large number of lines involved
                             vstart = view.text_point(start, 0)
                             text = ''.join(line+'\n' for line in lines)
@@ -406,8 +567,10 @@ class ActualVim:
                                     view.replace(edit, r, text)
                                 else:
                                     view.erase(edit, r)
+                            self.debounce.applied(time.time() - applied)
+                            tracer.mark('sync', view.id())
                 else:
-                    tick = neo.vim.status()['changedtick']
+                    tick = self.vim.status()['changedtick']
                     if self.vim_changes is None or tick > self.vim_changes:
                         self.vim_changes = tick
                         # TODO: global UI change is GROSS, do deltas if possible
@@ -427,17 +590,17 @@ class ActualVim:
         if edit:
             update(self.view, edit)
         else:
-            Edit.defer(self.view, update)
+            self.frame.defer(update)
 
     def sel_to_vim(self, force=False):
         if not self.actual: return
         if self.sel_changed() and not self.changed or force:
-            neo.vim.force_ready()
+            self.vim.force_ready()
 
             # single selection for now...
             # TODO: multiple select vim plugin integration
             sel = self.view.sel()[0]
-            vim = neo.vim
+            vim = self.vim
             b = self.vim_rowcol(sel.b)
             b = (b[0] + 1, b[1] + 1)
 
@@ -484,13 +647,13 @@ class ActualVim:
         row, col = view.rowcol(view.layout_to_text(view.viewport_position()))
         # TODO: UTF8?
         wview = {'topline': row + 1, 'leftcol': col + 1}
-        neo.vim.eval('winrestview({})'.format(wview))
+        self.vim.eval('winrestview({})'.format(wview))
 
     def viewport_from_vim(self, queue=True):
         if not self.actual: return
         def update():
             view = self.view
-            status = neo.vim.status()
+            status = self.vim.status()
             wview = status['wview']
             lineoff = wview['topline'] - wview['topfill'] - 1
             coloff = wview['leftcol'] - wview['skipcol'] - 1
@@ -516,14 +679,14 @@ class ActualVim:
                     or edge_check):
                 view.set_viewport_position(pos, bool(settings.get('smooth_scroll')))
         if queue:
-            sublime.set_timeout(update, 0)
+            self.frame.post('viewport', update)
         else:
             update()
 
     def sel_from_vim(self, edit=None):
         if not self.actual: return
 
-        status = neo.vim.status()
+        status = self.vim.status()
         a = (status['vline'], status['vcol'])
         b = (status['cline'], status['ccol'])
 
@@ -536,31 +699,52 @@ class ActualVim:
             sel.clear()
             sel.add_all(new_sel)
             self.sel_changed()
+            tracer.mark('selection', view.id())
 
         if edit:
             select(self.view, edit)
         else:
-            Edit.defer(self.view, select)
+            self.frame.post('selection', select)
 
     def status_from_vim(self):
-        status = neo.vim.status_line
-        if status:
-            self.view.set_status('actual', status)
-        else:
-            self.view.erase_status('actual')
+        def update():
+            status = self.vim.status_line
+            if status:
+                self.view.set_status('actual', status)
+            else:
+                self.view.erase_status('actual')
+        self.frame.post('status', update)
 
     def update(self, edit=None):
         with self.update_lock:
             if self.update_needed:
                 self.update_needed = 0
+                # a key is waiting on this update, time the status fetch for it
+                self.vim.status()
+                tracer.mark('status', self.view.id())
                 self.sync_from_vim(edit=edit)
                 self.update_view()
             else:
                 self.viewport_from_vim(queue=False)
 
+    def queue_key(self, key):
+        if neo.start_failed:
+            self.pending_keys = []
+            sublime.status_message('ActualVim: nvim failed to start, see the console')
+        elif len(self.pending_keys) >= PENDING_KEYS_MAX:
+            sublime.status_message('ActualVim: still waiting on nvim, dropping keys')
+        else:
+            self.pending_keys.append(key)
+
     def press(self, key, edit=None):
-        if not neo._loaded: return
+        if not neo._loaded:
+            if settings.enabled():
+                neo.start()
+                self.queue_key(key)
+            return
         if self.buf is None:
+            # not activated yet, or waiting on a pooled nvim
+            self.queue_key(key)
             return
 
         self.keyq.put(key)
@@ -568,39 +752,46 @@ class ActualVim:
         self.busy.acquire()
         with self.busy:
             key = self.keyq.get()
+            tracer.mark('queue', self.view.id())
             with self.update_lock:
                 self.update_needed += 1
             def onready():
-                sublime.set_timeout(self.update, 0)
+                self.frame.post('update', lambda view, edit: self.update(edit))
 
             # syncing the viewport to vim here fixes the case where the user scrolled the view in sublime between keypresses
-            if neo.vim.nvim_mode:
-                res = neo.vim.nv.request('nvim_get_mode') or {}
-                if not res.get('blocking', True):
-                    self.viewport_to_vim()
+            if self.vim.nvim_mode and self.vim.check_ready():
+                self.viewport_to_vim()
+                tracer.mark('viewport', self.view.id())
 
             # don't debounce user input
             self.last_event = 0
-            _, ready = neo.vim.press(key, onready)
+            _, ready = self.vim.press(key, onready)
             if ready:
                 self.update(edit)
             return ready
 
     def close(self):
+        if self.debounce_timer:
+            self.debounce_timer.cancel()
         if neo._loaded:
-            neo.vim.force_ready()
+            vim = self.vim
+            vim.force_ready()
             if self.buf is not None:
                 if self.live:
                     try:
                         self.buf.api.detach()
                     except Exception:
                         pass
-                neo.vim.buf_close(self.buf)
+                vim.buf_close(self.buf)
+                neo.pool.release(vim)
         ActualVim.remove(self.view)
 
     def set_path(self, path):
+        # activate() sets it if we don't have a buffer yet
+        if self.buf is None:
+            return
         self.buf.name = path
-        neo.vim.cmd('filetype detect')
+        self.vim.cmd('filetype detect')
 
     # neovim event callbacks
     def on_bell(self):
@@ -620,48 +811,69 @@ class ActualVim:
         def html_escape(s):
             return s.replace('&', '&amp;').replace('<', '&lt;')
 
+        def item_html(i):
+            # escaped item html is cached, the selected row is the only one that differs
+            popup = self.popup
+            html = popup['html'][i]
+            if html is None:
+                text, kind = popup['items'][i][:2]
+                kind = POPUP_KIND.format(kind=html_escape(kind)) if kind else ''
+                html = popup['html'][i] = POPUP_ITEM.format(text=html_escape(text), kind=kind)
+            if i == popup['selected']:
+                html = html.replace('actualvim-popup-item', 'actualvim-popup-item actualvim-popup-item-selected', 1)
+            return html
+
         def render(update=False):
-            if self.popup:
-                template = '''
-                    <style>
-                        .actualvim-popup-item-selected {{
-                            background-color: color(var(--background) blend(grey 80%));
-                        }}
-                        .actualvim-popup-item {{
-                            padding: 6px 14px 6px 14px;
-                        }}
-                        html, body, #actualvim-popup {{
-                            padding: 0;
-                            margin: 0;
-                        }}
-                    </style>
-                    <div id="actualvim-popup">
-                    {items}
-                    </div>
-                '''
-                # TODO: use item['kind']?
-                item_template = '''
-                <div class="actualvim-popup-item{classes}">{text}</div>
-                '''
-                items = []
-                for i, item in enumerate(self.popup['items']):
-                    item = item.copy()
-                    item['classes'] = ''
-                    if i == self.popup['selected']:
-                        item['classes'] = ' actualvim-popup-item-selected'
-                    items.append(item_template.format_map(item))
-                html = template.format(items='\n'.join(items))
-                if self.view.is_popup_visible() and update:
-                    self.view.update_popup(html)
-                else:
-                    self.view.show_popup(html, 0, -1, 300, 600, None, None)
+            # only a window of rows around the selection is rendered, large menus would be megabytes of html
+            popup = self.popup
+            if not popup:
+                return
+            count = len(popup['items'])
+            selected, top = popup['selected'], popup['top']
+            if selected >= 0:
+                if selected < top:
+                    top = selected
+                elif selected >= top + POPUP_ROWS:
+                    top = selected - POPUP_ROWS + 1
+            top = max(0, min(top, count - POPUP_ROWS))
+            bottom = min(count, top + POPUP_ROWS)
+
+            rows = popup['rows']
+            last = popup['last_selected']
+            if rows is not None and top == popup['top']:
+                if selected == last:
+                    return
+                # same window, swap the old and new selected rows
+                for i in (last, selected):
+                    if top <= i < bottom:
+                        rows[i - top] = item_html(i)
+            else:
+                rows = popup['rows'] = [item_html(i) for i in range(top, bottom)]
+            popup['top'], popup['last_selected'] = top, selected
+
+            scroll = ''
+            if count > POPUP_ROWS:
+                scroll = POPUP_SCROLL.format(first=top + 1, last=bottom, count=count)
+            html = POPUP_TEMPLATE.format(items='\n'.join(rows), scroll=scroll)
+            if self.view.is_popup_visible() and update:
+                self.view.update_popup(html)
+            else:
+                self.view.show_popup(html, 0, -1, 300, 600, None, None)
 
         if cmd == 'popupmenu_show':
             items, selected, row, col = args[0]
-            items = [{'text': html_escape(item[0]), 'kind': html_escape(item[1])} for item in items]
-            self.popup = {'items': items, 'selected': selected, 'pos': (row, col)}
+            self.popup = {
+                'items': items,
+                'html': [None] * len(items),
+                'selected': selected,
+                'pos': (row, col),
+                'top': 0,
+                'rows': None,
+                'last_selected': None,
+            }
             render(update=False)
         elif cmd == 'popupmenu_hide':
+            self.popup = None
             self.view.hide_popup()
         elif cmd == 'popupmenu_select':
             if self.popup:
@@ -680,8 +892,8 @@ class ActualVim:
                     with self.update_lock:
                         self.update_needed += 1
                     def onready():
-                        sublime.set_timeout(self.update, 0)
-                    _, ready = neo.vim.press('<cr>', onready)
+                        self.frame.post('update', lambda view, edit: self.update(edit))
+                    _, ready = self.vim.press('<cr>', onready)
                     if ready: self.update()
 
                 def on_cancel():
@@ -725,29 +937,53 @@ class ActualVim:
     def on_write(self):
         self.view.run_command('save')
 
-    def on_complete(self, findstart, base):
-        def cur():
-            status = neo.vim.status()
-            a = (status['vline'], status['vcol'])
-            b = (status['cline'], status['ccol'])
-            sel = self.visual(neo.vim.mode, a, b)
-            return sel[0].b
+    def on_complete(self, findstart, base, line=None, col=None):
+        # line and col are nvim's cursor (1-based, col in bytes), older setups don't send them
+        if line is None:
+            status = self.vim.status()
+            line, col = status['cline'] + 1, status['ccol'] + 1
+        row = line - 1
 
         if int(findstart):
-            word = self.view.word(cur())
-            r, c = self.vim_rowcol(word.a)
+            if self.words.ready:
+                c = self.words.word_start(row, col - 1)
+            else:
+                word = self.view.word(self.vim_text_point(row, col - 1))
+                r, c = self.vim_rowcol(word.a)
+            self.complete_start = (line, c + 1)
             return c
 
-        loc = cur()
+        # answer from the word index right away, nvim is blocked until we return
+        if self.words.ready:
+            words = self.words.complete(base)
+        else:
+            words = self.view.extract_completions(base)
+
+        start = self.complete_start
+        if not start or start[0] != line:
+            return words
+        sublime.set_timeout(lambda: self.complete_async(line, start[1], col, base, words), 0)
+        # plugins only answer on the main thread, so their flags are only known up front when this
+        # exact query was asked before, otherwise the async answer replaces the words if need be
+        query, flags = self.complete_flags
+        if query == (line, start[1], base) and flags & sublime.INHIBIT_WORD_COMPLETIONS:
+            return []
+        return words
+
+    def complete_async(self, line, startcol, col, base, words):
+        # plugin completions can be slow, so they're merged in through complete() when they arrive
+        loc = self.vim_text_point(line - 1, col - 1)
         completions, flags = sublime_plugin.on_query_completions(self.view.id(), base, [loc])
-        if not flags & sublime.INHIBIT_WORD_COMPLETIONS:
-            completions += self.view.extract_completions(base)
-
-        # TODO: .sublime-completion support?
-        if not flags & sublime.INHIBIT_EXPLICIT_COMPLETIONS:
-            pass
+        self.complete_flags = ((line, startcol, base), flags)
+        # TODO: .sublime-completion support? (INHIBIT_EXPLICIT_COMPLETIONS)
+        if not completions and not flags & sublime.INHIBIT_WORD_COMPLETIONS:
+            return
 
-        return completions
+        items = [vim_item(c) for c in completions]
+        if not flags & sublime.INHIBIT_WORD_COMPLETIONS:
+            seen = {item['word'] for item in items}
+            items += [{'word': w} for w in words if not w in seen]
+        self.vim.nv.request('nvim_call_function', 'ActualVimCompleteAsync', [line, startcol, base, items], async=True)
 
     def highlight(self, highlights=None):
         if not settings.get('highlights', False):
@@ -760,7 +996,7 @@ class ActualVim:
         # TODO: autocmd VimResized?
         # TODO: split views?
         # TODO: allow configuring scope ("colormap")
-        status = neo.vim.status(False)
+        status = self.vim.status(False)
         if not status:
             return
 
@@ -775,41 +1011,60 @@ class ActualVim:
         wview = status['wview']
         lineoff = wview['topline'] - wview['topfill'] - 1
         coloff = wview['leftcol'] - wview['skipcol'] - 1
-        if highlights == self.last_highlights:
+        view = self.view
+        stamp = view.change_count()
+        if highlights == self.last_highlights and stamp == self.highlight_stamp:
             return
         self.last_highlights = highlights
+        # regions move with edits, so after an edit a cached line's regions may no longer be where they belong
+        edited = stamp != self.highlight_stamp
+        self.highlight_stamp = stamp
 
-        regions = []
-        lines = {
-            (line + lineoff): self.buf[line + lineoff]
-            for line in {hl.line for hl in highlights}
-            if line + lineoff < len(self.buf)
-        }
+        # regions are keyed per buffer line, so only lines whose spans changed are re-added
+        spans = {}
         for hl in highlights:
-            line = hl.line + lineoff
-            start = hl.start + coloff
-            end = hl.end + coloff
-            # fix tabs
-            if not status['expandtab']:
-                fix = lambda pos: pos - lines[line][:pos].count('\t') * (status['ts'] - 1)
-                start, end = fix(start), fix(end)
-            a = self.view.text_point(line, start)
-            b = self.view.text_point(line, end)
-            regions.append(sublime.Region(a, b))
-
-        if regions:
-            self.view.add_regions('actualvim_highlight', regions, 'error', '', sublime.DRAW_NO_FILL)
-        else:
-            self.view.erase_regions('actualvim_highlight')
+            spans.setdefault(hl.line + lineoff, []).append((hl.start + coloff, hl.end + coloff))
+
+        for line in set(self.highlight_lines) - set(spans):
+            view.erase_regions('actualvim_highlight_{:d}'.format(line))
+            del self.highlight_lines[line]
+
+        tabs = (status['expandtab'], status['ts'])
+        last_line = view.rowcol(view.size())[0]
+        for line, cols in spans.items():
+            key = (tuple(cols), tabs)
+            cached = self.highlight_lines.get(line) == key
+            if cached and not edited:
+                continue
+
+            regions = []
+            if line <= last_line:
+                pos = view.text_point(line, 0)
+                text = view.substr(view.line(pos))
+                for start, end in cols:
+                    # fix tabs
+                    if not status['expandtab']:
+                        fix = lambda pos: pos - text[:pos].count('\t') * (status['ts'] - 1)
+                        start, end = fix(start), fix(end)
+                    regions.append(sublime.Region(pos + start, pos + end))
+
+            name = 'actualvim_highlight_{:d}'.format(line)
+            # only lines around the edit moved, the rest don't need to be drawn again
+            if cached and [(r.a, r.b) for r in view.get_regions(name)] == [(r.a, r.b) for r in regions]:
+                continue
+            self.highlight_lines[line] = key
+            if regions:
+                view.add_regions(name, regions, 'error', '', sublime.DRAW_NO_FILL)
+            else:
+                view.erase_regions(name)
 
     def on_nvim_lines_debounced(self, changedtick, start, end, lines, more):
         if self.vim_changes is None or changedtick > self.vim_changes:
             self.sync_from_vim(lines_event=(changedtick, start, end, lines))
             self.last_event = time.time()
 
-    def nvim_line_debounce(self, timeout=0.05):
+    def nvim_line_debounce(self):
         with self.debounce_cond:
-            self.debounce_cond.wait(timeout)
             for key, args in self.debounce_queue:
                 self.on_nvim_lines_debounced(*args)
 
@@ -821,11 +1076,13 @@ class ActualVim:
             self.debounce_queue = []
 
     def on_nvim_lines(self, changedtick, start, end, lines, more):
+        # the index follows nvim's buffer, including changes we made ourselves
+        self.words.update(start, end, lines, changedtick)
         if self.vim_changes is not None and changedtick <= self.vim_changes:
             return
         args = (changedtick, start, end, lines, more)
 
-        threshold = 0.01
+        self.debounce.arrived()
         with self.debounce_cond:
             key = (start, end)
             if self.debouncing:
@@ -833,10 +1090,14 @@ class ActualVim:
                     self.debounce_queue[-1] = (key, args)
                 else:
                     self.debounce_queue.append((key, args))
-            elif time.time() - self.last_event < threshold:
+            elif time.time() - self.last_event < self.debounce.threshold:
                 self.debouncing = True
                 self.debounce_queue.append((key, args))
-                threading.Thread(target=self.nvim_line_debounce, daemon=True).start()
+                timeout = self.debounce.window
+                if self.debounce_timer:
+                    self.debounce_timer.reschedule(timeout)
+                else:
+                    self.debounce_timer = timers.schedule(timeout, self.nvim_line_debounce)
             else:
                 self.on_nvim_lines_debounced(*args)
 
@@ -853,7 +1114,7 @@ class ActualVim:
             return
         self.screen_changes = screen.changes
         hl = screen.highlights()
-        sublime.set_timeout(lambda: self.highlight(hl), 0)
+        self.frame.post('highlights', lambda: self.highlight(hl))
         self.status_from_vim()
 
     def on_appcmd(self, cmd, args): sublime.run_command(cmd, args or {})
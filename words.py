@@ -0,0 +1,99 @@
+# words.py
+# per-view word index for completion, kept up to date from nvim lines events
+#
+# the buffer lines are always mirrored (a list splice per event), word counts are only
+# built on the first completion request and maintained incrementally from then on
+
+import bisect
+import collections
+import re
+import threading
+
+WORD = re.compile(r'\w+')
+
+
+def words(lines):
+    out = collections.Counter()
+    for line in lines:
+        out.update(WORD.findall(line))
+    return out
+
+
+class WordIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # None until nvim sent us the buffer
+        self.lines = None
+        self.counts = None
+        # changedtick of the last reset, older lines events are already part of it
+        self.tick = None
+        # sorted vocabulary for prefix lookups, rebuilt when words appear or disappear
+        self.vocab = None
+
+    @property
+    def ready(self):
+        return self.lines is not None
+
+    def reset(self, lines=None, tick=None):
+        with self.lock:
+            self.lines = list(lines) if lines is not None else None
+            self.tick = tick
+            self.counts = None
+            self.vocab = None
+
+    def update(self, start, end, lines, tick=None):
+        # same arguments as nvim_buf_lines_event, end == -1 replaces everything from start
+        with self.lock:
+            if tick is not None and self.tick is not None and tick <= self.tick:
+                return
+            if self.lines is None:
+                if start != 0 or end != -1:
+                    # we missed the initial event, can't index until the next full sync
+                    return
+                self.lines = []
+            if end == -1:
+                end = len(self.lines)
+            if self.counts is not None:
+                old = words(self.lines[start:end])
+                new = words(lines)
+                counts = self.counts
+                added = any(w not in counts for w in new)
+                counts.update(new)
+                counts.subtract(old)
+                removed = [w for w in old if counts[w] <= 0]
+                for w in removed:
+                    del counts[w]
+                if added or removed:
+                    self.vocab = None
+            self.lines[start:end] = lines
+
+    def line(self, row):
+        with self.lock:
+            if self.lines is not None and 0 <= row < len(self.lines):
+                return self.lines[row]
+            return ''
+
+    def word_start(self, row, col):
+        # byte column where the word ending at byte column col of row starts
+        prefix = self.line(row).encode('utf-8')[:col].decode('utf-8', 'ignore')
+        m = re.search(r'\w*$', prefix)
+        return len(prefix[:m.start()].encode('utf-8'))
+
+    def complete(self, prefix):
+        # words starting with prefix, most frequent first
+        with self.lock:
+            if self.lines is None:
+                return []
+            if self.counts is None:
+                self.counts = words(self.lines)
+            if self.vocab is None:
+                self.vocab = sorted(self.counts)
+            vocab, counts = self.vocab, self.counts
+            i = bisect.bisect_left(vocab, prefix)
+            out = []
+            while i < len(vocab) and vocab[i].startswith(prefix):
+                if vocab[i] != prefix:
+                    out.append(vocab[i])
+                i += 1
+            out.sort(key=lambda w: -counts[w])
+        return out